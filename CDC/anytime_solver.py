@@ -0,0 +1,226 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+import numpy as np
+
+from optimal_route import STEP_DTYPE, solve_with_ors_optimization
+from local_routing import straight_line_duration_matrix
+
+# Seconds allowed for a solve when user_prefs has no 'time_budget'
+DEFAULT_TIME_BUDGET = 10
+
+# Remote solves run here so a slow ORS response never blocks the caller past its deadline.
+# Callers with many concurrent solves (batch exports) should pass their own executor.
+_remote_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ors-solve')
+
+
+def route_cost(order, durations):
+    """Total travel time of start -> order -> start."""
+    stops = [0] + order + [0]
+    return sum(durations[a][b] for a, b in zip(stops, stops[1:]))
+
+
+def schedule_route(order, durations, services, start_s, end_s):
+    """Arrival times for each stop in `order` and the return time, or None if it overruns end_s."""
+    arrivals = []
+    t = start_s
+    prev = 0
+    for idx in order:
+        t += durations[prev][idx]
+        arrivals.append(t)
+        t += services[idx]
+        prev = idx
+    t += durations[prev][0]
+    if t > end_s:
+        return None
+    return arrivals, t
+
+
+def greedy_route(durations, services, start_s, end_s):
+    """Nearest-neighbour route that keeps adding stops while it can still get back in time."""
+    unvisited = set(range(1, len(durations)))
+    order = []
+    t = start_s
+    prev = 0
+    while True:
+        best = None
+        for j in unvisited:
+            finish = t + durations[prev][j] + services[j]
+            if finish + durations[j][0] <= end_s and (best is None or durations[prev][j] < durations[prev][best]):
+                best = j
+        if best is None:
+            return order
+        t += durations[prev][best] + services[best]
+        order.append(best)
+        unvisited.remove(best)
+        prev = best
+
+
+def improve_route(order, durations, services, start_s, end_s, deadline, stop=None):
+    """Local search until `deadline` (time.monotonic) or a local optimum.
+
+    Alternates 2-opt moves that shorten the route with cheapest feasible
+    insertion of unvisited stops, so more stops beat less travel time.
+    `stop` is an optional callable that ends the search early.
+    """
+    order = list(order)
+    improved = True
+    while improved:
+        improved = False
+
+        cost = route_cost(order, durations)
+        for i in range(len(order) - 1):
+            for j in range(i + 1, len(order)):
+                if time.monotonic() >= deadline or (stop is not None and stop()):
+                    return order
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                candidate_cost = route_cost(candidate, durations)
+                if candidate_cost < cost and schedule_route(candidate, durations, services, start_s, end_s):
+                    order, cost = candidate, candidate_cost
+                    improved = True
+
+        unvisited = set(range(1, len(durations))) - set(order)
+        best = None
+        for j in unvisited:
+            for pos in range(len(order) + 1):
+                candidate = order[:pos] + [j] + order[pos:]
+                candidate_cost = route_cost(candidate, durations)
+                if (best is None or candidate_cost < best[0]) and \
+                        schedule_route(candidate, durations, services, start_s, end_s):
+                    best = (candidate_cost, candidate)
+        if best is not None:
+            order = best[1]
+            improved = True
+    return order
+
+
+def route_to_steps(order, durations, services, start_s, end_s):
+    """Build (route, steps_info) in the same shape as solve_with_ors_optimization.
+
+    Returns (None, None) if the route does not fit the time window (e.g. end before start).
+    """
+    schedule = schedule_route(order, durations, services, start_s, end_s)
+    if schedule is None:
+        return None, None
+    arrivals, end_arrival = schedule
+    steps = [('start', 0, start_s)]
+    steps.extend(('job', idx, arrival) for idx, arrival in zip(order, arrivals))
+    steps.append(('end', 0, end_arrival))
+    return [0] + order + [0], np.array(steps, dtype=STEP_DTYPE)
+
+
+def local_duration_matrix(locations, profile, graph=None, store=None):
+    """Best travel-time matrix available without calling ORS.
+
+    Uses the routing graph if there is one; otherwise straight-line estimates,
+    overwritten by every place pair the TravelTimeStore already knows.
+    """
+    if graph is not None:
+        return graph.duration_matrix(locations.coords, profile)
+    durations = straight_line_duration_matrix(locations.coords, profile)
+    if store is not None and len(locations) > 1:
+        known = store.lookup(locations.ids[1:])
+        found = ~np.isnan(known)
+        durations[1:, 1:][found] = np.rint(known[found])
+    return durations
+
+
+def _in_thread(fn, *args):
+    """Run fn(*args) on a daemon thread and return a Future for its result."""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def solve_anytime(locations, user_prefs, api_key, graph=None, store=None, on_update=None, executor=None):
+    """Solve within a hard deadline of user_prefs['time_budget'] seconds.
+
+    Travel times are computed once (see local_duration_matrix) inside the
+    budget and shared with the ORS optimizer, which runs in the background
+    while a local greedy route is built (and passed to `on_update`) and then
+    improved. The ORS
+    answer is used if it arrives before the deadline; otherwise the best local
+    route is returned. Returns (route, steps_info, report) where report says
+    which backend produced the answer and how good the local solution got;
+    route and steps_info are None if not even an empty tour fits the window.
+    The ORS call runs on `executor` (default: a shared 4-thread pool).
+    """
+    budget = user_prefs.get('time_budget', DEFAULT_TIME_BUDGET)
+    started = time.monotonic()
+    deadline = started + budget
+    profile = user_prefs['mode_of_travel']
+
+    # The matrix is computed once, within the budget, and shared by both solvers
+    matrix = _in_thread(local_duration_matrix, locations, profile, graph, store)
+    try:
+        durations = matrix.result(timeout=budget)
+    except TimeoutError:
+        print(f"Local travel times missed the {budget}s deadline, using straight-line estimates.")
+        durations = None
+
+    if durations is not None:
+        # The store path still lets ORS fill in the pairs the store is missing
+        remote = (executor or _remote_executor).submit(solve_with_ors_optimization, locations, user_prefs, api_key,
+                                         store=store, deadline=deadline,
+                                         durations=durations if graph is not None else None)
+    else:
+        # The budget is spent, so ORS is not asked at all
+        remote = Future()
+        remote.set_result((None, None))
+        durations = straight_line_duration_matrix(locations.coords, profile)
+
+    def remote_succeeded():
+        return remote.done() and remote.exception() is None and bool(remote.result()[0])
+
+    durations = durations.tolist()
+    services = (locations.visit_duration * 60).tolist()
+    start_s = user_prefs['start_time'] * 60
+    end_s = user_prefs['end_time'] * 60
+
+    order = greedy_route(durations, services, start_s, end_s)
+    greedy_cost = route_cost(order, durations)
+    greedy_visited = len(order)
+    if on_update is not None:
+        greedy_steps = route_to_steps(order, durations, services, start_s, end_s)
+        if greedy_steps[0] is not None:
+            on_update(*greedy_steps)
+
+    order = improve_route(order, durations, services, start_s, end_s, deadline, stop=remote_succeeded)
+    local_cost = route_cost(order, durations)
+
+    route, steps_info = None, None
+    try:
+        route, steps_info = remote.result(timeout=max(0.0, deadline - time.monotonic()))
+    except TimeoutError:
+        # Drops the solve if it is still queued; a running one stops at its next HTTP call
+        remote.cancel()
+        print(f"ORS optimization missed the {budget}s deadline, using the local route.")
+    except Exception as e:
+        print("ORS optimization failed, using the local route:", e)
+
+    if route:
+        backend = 'ors'
+    else:
+        backend = 'local'
+        route, steps_info = route_to_steps(order, durations, services, start_s, end_s)
+
+    report = {
+        'backend': backend,
+        'elapsed': round(time.monotonic() - started, 3),
+        'budget': budget,
+        'candidates': len(locations) - 1,
+        'visited': int((steps_info['type'] == 'job').sum()) if steps_info is not None else 0,
+        'greedy_visited': greedy_visited,
+        'local_visited': len(order),
+        # Travel time saved by local search relative to the first greedy route
+        'local_improvement': round(1 - local_cost / greedy_cost, 3) if greedy_cost else 0.0
+    }
+    return route, steps_info, report
@@ -0,0 +1,177 @@
+"""Batch itinerary exporter.
+
+Reads a JSON list (or CSV) of preference sets, computes every itinerary on a
+worker pool and writes one JSON object per line:
+
+    python batch_export.py featured.json -o itineraries.jsonl --workers 8 --payloads
+
+CSV columns use the user_prefs keys, with categories separated by ';'.
+The ORS key comes from --api-key or the ORS_API_KEY environment variable.
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from optimal_route import fetch_places, seconds_to_time
+from itinerary_jobs import run_itinerary
+
+# Same defaults as the itinerary form in data_viz.py, except for the solver time
+# budget: batch runs wait for ORS unless a budget is given (--time-budget or per row)
+DEFAULT_PREFS = {
+    'categories': ['poi', 'restaurant', 'attraction', 'accommodation'],
+    'start_lat': 41.877134,
+    'start_lng': 12.492443,
+    'start_time': 480,
+    'end_time': 1000,
+    'mode_of_travel': 'driving-car',
+    'min_polarity': 4.0,
+    'min_num_reviews': 6,
+    'min_restaurants': 2,
+    'max_restaurants': 2,
+    'underground': False,
+    'remove_tourist': False,
+    'trip_date': None,
+    'time_budget': None
+}
+
+BOOL_KEYS = ('underground', 'remove_tourist')
+
+
+def load_prefs(path, defaults=DEFAULT_PREFS):
+    """Read preference sets from a JSON list or a CSV file, filling in `defaults`."""
+    if path.endswith('.csv'):
+        rows = pd.read_csv(path).to_dict(orient='records')
+    else:
+        with open(path) as f:
+            rows = json.load(f)
+
+    prefs_list = []
+    for row in rows:
+        row = {key: value for key, value in row.items() if not (isinstance(value, float) and np.isnan(value))}
+        user_prefs = {**defaults, **row}
+        if isinstance(user_prefs['categories'], str):
+            user_prefs['categories'] = [cat.strip() for cat in user_prefs['categories'].split(';') if cat.strip()]
+        for key in BOOL_KEYS:
+            if isinstance(user_prefs[key], str):
+                user_prefs[key] = user_prefs[key].strip().lower() in ('1', 'true', 'yes')
+        prefs_list.append(user_prefs)
+    return prefs_list
+
+
+@lru_cache(maxsize=32)
+def city_places(city, categories):
+    """Fetched place frame per (city, categories), shared by every worker."""
+    return fetch_places(city, list(categories))
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def export_itinerary(index, user_prefs, api_key, N, with_payload, solver_executor=None):
+    """Compute one itinerary and return its JSON Lines record."""
+    started = time.monotonic()
+    record = {'index': index, 'prefs': user_prefs}
+    try:
+        places = city_places(user_prefs['city'], tuple(user_prefs['categories']))
+        result = run_itinerary(user_prefs, api_key, N=N, places=places, with_payload=with_payload,
+                               executor=solver_executor)
+    except Exception as e:
+        record.update(status='error', error=repr(e))
+    else:
+        if result is None:
+            record['status'] = 'no_solution'
+        else:
+            locations = result['locations']
+            stops = []
+            for step_type, loc_idx, arrival in result['steps_info'].tolist():
+                loc = locations.row(loc_idx)
+                stops.append({
+                    'type': step_type,
+                    'id': loc['id'],
+                    'name': loc['name'],
+                    'category': loc['category'],
+                    'lat': loc['lat'],
+                    'lng': loc['lng'],
+                    'arrival': seconds_to_time(arrival)
+                })
+            record.update(status='ok', itinerary=stops, solver=result['solver'])
+            if with_payload:
+                record['payload'] = result['payload']
+    record['elapsed'] = round(time.monotonic() - started, 3)
+    return record
+
+
+def export_all(prefs_list, api_key, output, workers=4, N=25, with_payload=False):
+    """Run every preference set on a thread pool and write JSON Lines; returns a summary dict."""
+    # Same-city requests run back to back so the per-city place cache stays warm
+    order = sorted(range(len(prefs_list)), key=lambda i: str(prefs_list[i].get('city', '')))
+    statuses = Counter()
+    backends = Counter()
+    started = time.monotonic()
+
+    # Time-budgeted solves get a remote ORS pool as large as the worker pool, so
+    # workers never queue behind each other (or the app) and miss their deadline
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-ors') as solver_executor, \
+            open(output, 'w') as out:
+        futures = [
+            executor.submit(export_itinerary, i, prefs_list[i], api_key, N, with_payload, solver_executor)
+            for i in order
+        ]
+        for future in futures:
+            record = future.result()
+            statuses[record['status']] += 1
+            if record.get('solver'):
+                backends[record['solver']['backend']] += 1
+            out.write(json.dumps(record, default=_json_default) + '\n')
+
+    elapsed = time.monotonic() - started
+    return {
+        'total': len(prefs_list),
+        'ok': statuses['ok'],
+        'no_solution': statuses['no_solution'],
+        'errors': statuses['error'],
+        'backends': dict(backends),
+        'seconds': round(elapsed, 2),
+        'itineraries_per_second': round(len(prefs_list) / elapsed, 2) if elapsed > 0 else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export itineraries for many preference sets.")
+    parser.add_argument('input', help="JSON list or CSV of user preference sets")
+    parser.add_argument('-o', '--output', default='itineraries.jsonl', help="JSON Lines output file")
+    parser.add_argument('--workers', type=int, default=4, help="number of worker threads")
+    parser.add_argument('--top-n', type=int, default=25, help="candidate places per itinerary")
+    parser.add_argument('--payloads', action='store_true', help="include the compact map payload in each record")
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help="solver deadline in seconds (default: wait for ORS)")
+    parser.add_argument('--api-key', default=os.environ.get('ORS_API_KEY'), help="OpenRouteService API key")
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("an ORS API key is required (--api-key or ORS_API_KEY)")
+
+    prefs_list = load_prefs(args.input, {**DEFAULT_PREFS, 'time_budget': args.time_budget})
+    summary = export_all(prefs_list, args.api_key, args.output, workers=args.workers,
+                         N=args.top_n, with_payload=args.payloads)
+
+    print(f"\nExported {summary['total']} itineraries to {args.output} in {summary['seconds']}s "
+          f"({summary['itineraries_per_second']} itineraries/s)")
+    print(f"ok: {summary['ok']}, no solution: {summary['no_solution']}, errors: {summary['errors']}")
+    if summary['backends']:
+        print("solved by: " + ", ".join(f"{name} {count}" for name, count in summary['backends'].items()))
+
+
+if __name__ == "__main__":
+    main()
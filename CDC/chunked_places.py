@@ -0,0 +1,205 @@
+import heapq
+import itertools
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 50000
+
+# Rows held in memory before a sorted run is spilled to disk
+DEFAULT_RUN_ROWS = 200000
+
+
+def iter_csv_chunks(paths, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield DataFrame batches of at most `chunksize` rows from one or more CSV files."""
+    for path in paths:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def iter_record_chunks(records, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield DataFrame batches from any iterable of place dicts."""
+    it = iter(records)
+    while True:
+        batch = list(itertools.islice(it, chunksize))
+        if not batch:
+            return
+        yield pd.DataFrame(batch)
+
+
+def filter_reviews(chunk, min_reviews, max_reviews):
+    """Keep places with min_reviews <= numReviews <= max_reviews (missing counts as 0)."""
+    reviews = chunk['numReviews'].fillna(0)
+    return chunk[(reviews >= min_reviews) & (reviews <= max_reviews)]
+
+
+def score_bounds(chunks):
+    """First pass: min/max of polarity and numReviews over all chunks."""
+    bounds = {}
+    for chunk in chunks:
+        for col in ('polarity', 'numReviews'):
+            values = chunk[col].dropna()
+            if values.empty:
+                continue
+            lo, hi = values.min(), values.max()
+            if col in bounds:
+                lo, hi = min(lo, bounds[col][0]), max(hi, bounds[col][1])
+            bounds[col] = (lo, hi)
+    return bounds
+
+
+def _normalize(series, lo, hi):
+    if hi - lo == 0:
+        return series - lo
+    return (series - lo) / (hi - lo)
+
+
+def score_chunk(chunk, bounds, underground=False):
+    """Second pass: same scores as compute_scores / compute_scores_underground,
+    normalised against global bounds from `score_bounds`."""
+    chunk = chunk.copy()
+    chunk['normalized_polarity'] = _normalize(chunk['polarity'], *bounds['polarity'])
+    chunk['normalized_numReviews'] = _normalize(chunk['numReviews'], *bounds['numReviews'])
+    if underground:
+        chunk['normalized_numReviews_inverse'] = 1 - chunk['normalized_numReviews']
+        chunk['overall_score'] = 0.7 * chunk['normalized_polarity'] + 0.3 * chunk['normalized_numReviews_inverse']
+    else:
+        chunk['overall_score'] = 0.7 * chunk['normalized_polarity'] + 1.5 * chunk['normalized_numReviews']
+    return chunk
+
+
+def top_n_per_category(chunks, n, score_col='overall_score'):
+    """Keep the `n` highest-scoring places per category using bounded heaps."""
+    heaps = {}
+    counter = itertools.count()
+    for chunk in chunks:
+        # Only each chunk's own top n per category can make the global top n
+        chunk = chunk.sort_values(score_col, ascending=False).groupby('category').head(n)
+        for record in chunk.to_dict(orient='records'):
+            heap = heaps.setdefault(record['category'], [])
+            item = (record[score_col], next(counter), record)
+            if len(heap) < n:
+                heapq.heappush(heap, item)
+            elif item[0] > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+    records = [item[2] for heap in heaps.values() for item in sorted(heap, reverse=True)]
+    return pd.DataFrame(records)
+
+
+def _sort_key(row):
+    # Same ordering as the rest of the repo: polarity descending, numReviews ascending
+    return (-row['polarity'], row['numReviews'])
+
+
+def _write_run(frame, spill_dir, run_id):
+    path = os.path.join(spill_dir, f'run_{run_id:05d}.csv')
+    frame.sort_values(by=['polarity', 'numReviews'], ascending=[False, True]).to_csv(path, index=False)
+    return path
+
+
+def _iter_run(path, chunksize):
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        yield from chunk.to_dict(orient='records')
+
+
+class _OutputWriter:
+    """Appends DataFrame batches to a CSV or Parquet file (chosen by extension)."""
+
+    def __init__(self, out_path, columns):
+        self.out_path = out_path
+        self.columns = columns
+        self.parquet = out_path.endswith('.parquet')
+        self.writer = None
+        self.header_written = False
+
+    def write(self, records):
+        frame = pd.DataFrame(records, columns=self.columns)
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self.writer is None:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                self.writer = pq.ParquetWriter(self.out_path, table.schema)
+            else:
+                table = pa.Table.from_pandas(frame, schema=self.writer.schema, preserve_index=False)
+            self.writer.write_table(table)
+        else:
+            frame.to_csv(self.out_path, mode='a' if self.header_written else 'w',
+                         header=not self.header_written, index=False)
+            self.header_written = True
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def sort_places(chunks, out_path, run_rows=DEFAULT_RUN_ROWS, chunksize=DEFAULT_CHUNKSIZE, spill_dir=None):
+    """External sort of place chunks by polarity (desc) then numReviews (asc).
+
+    Chunks are buffered into sorted runs of at most `run_rows` rows that are
+    spilled to disk, then k-way merged into `out_path` (.csv or .parquet).
+    Returns the number of rows written.
+    """
+    spill_dir = tempfile.mkdtemp(prefix='places_sort_', dir=spill_dir)
+    try:
+        runs = []
+        # Union of every chunk's columns in first-seen order; rows missing a column get NaN
+        columns = {}
+        buffer = []
+        buffered = 0
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            columns.update(dict.fromkeys(chunk.columns))
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= run_rows:
+                runs.append(_write_run(pd.concat(buffer, ignore_index=True), spill_dir, len(runs)))
+                buffer, buffered = [], 0
+        if buffer:
+            runs.append(_write_run(pd.concat(buffer, ignore_index=True), spill_dir, len(runs)))
+
+        if not runs:
+            return 0
+
+        writer = _OutputWriter(out_path, list(columns))
+        written = 0
+        try:
+            merged = heapq.merge(*(_iter_run(path, chunksize) for path in runs), key=_sort_key)
+            while True:
+                batch = list(itertools.islice(merged, chunksize))
+                if not batch:
+                    break
+                writer.write(batch)
+                written += len(batch)
+        finally:
+            writer.close()
+        return written
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def process_places(make_chunks, out_path, min_reviews=0, max_reviews=float('inf'),
+                   underground=False, top_n=None, **sort_kwargs):
+    """Two-pass chunked pipeline: filter by reviews, score, then write the result.
+
+    `make_chunks` is a callable returning a fresh chunk generator (it is read
+    twice: once for the score bounds, once for scoring). With `top_n` only the
+    best `top_n` places per category are kept; otherwise every place is
+    externally sorted into `out_path`. Returns the number of rows written.
+    """
+    def filtered():
+        for chunk in make_chunks():
+            yield filter_reviews(chunk, min_reviews, max_reviews)
+
+    bounds = score_bounds(filtered())
+    if not bounds:
+        return 0
+
+    scored = (score_chunk(chunk, bounds, underground) for chunk in filtered() if not chunk.empty)
+    if top_n is not None:
+        top = top_n_per_category(scored, top_n)
+        return sort_places([top], out_path, **sort_kwargs)
+    return sort_places(scored, out_path, **sort_kwargs)
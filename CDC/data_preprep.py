@@ -1,5 +1,9 @@
+import argparse
+import os
+import tempfile
+
 import requests
-import pandas as pd
+from chunked_places import iter_csv_chunks, iter_record_chunks, process_places
 
 def fetch_places(location, category):
     url = f"http://tour-pedia.org/api/getPlaces?location={location}&category={category}"
@@ -12,44 +16,47 @@ def fetch_places(location, category):
         print(f"Error fetching data from the API for {location}: {e}")
         return []  
     
-def filter_and_sort_places(places, min_reviews, max_reviews):
-    filtered_places = [place for place in places if min_reviews <= place.get('numReviews', 0) <= max_reviews]
-    
-    df = pd.DataFrame(filtered_places)
-    
-    df = df.sort_values(by=['polarity', 'numReviews'], ascending=[False, True])
-    
-    return df
+def iter_location_chunks(location, categories, chunksize=50000):
+    """Yield places for a location in DataFrame batches, one category at a time."""
+    for category in categories:
+        places = fetch_places(location, category)
+        if places:
+            yield from iter_record_chunks(places, chunksize)
 
-def save_to_csv(df, location):
-    filename = f'combined_places_{location.lower()}.csv'
-    df.to_csv(filename, index=False)
-    print(f"Data saved to {filename}")
+def stage_location(location, categories, staging_dir):
+    """Write a location's places to one CSV per batch so later passes re-read files, not the API."""
+    paths = []
+    for chunk in iter_location_chunks(location, categories):
+        path = os.path.join(staging_dir, f'chunk_{len(paths):05d}.csv')
+        chunk.to_csv(path, index=False)
+        paths.append(path)
+    return paths
 
 def main():
+    parser = argparse.ArgumentParser(description="Fetch, filter and score places for every city.")
+    parser.add_argument('--top-n', type=int, default=None, help="keep only the best N places per category")
+    parser.add_argument('--underground', action='store_true', help="favour places with fewer reviews")
+    args = parser.parse_args()
+
     locations = ['Amsterdam', 'Tuscany', 'Barcelona', 'Berlin', 'Dubai', 'London', 'Paris', 'Rome']
     categories = ['poi', 'restaurant', 'attraction', 'accommodation']
     min_reviews = 10
     max_reviews = 10000
     
     for location in locations:
-        all_places = []
-        for category in categories:
-            places = fetch_places(location, category)
-            if places:
-                all_places.extend(places)
-        
-        if all_places:
-            top_underground_places = filter_and_sort_places(all_places, min_reviews, max_reviews)
-            if not top_underground_places.empty:
-                print(f"Filtered places for {location}:")
-                print(top_underground_places)
-                
-                save_to_csv(top_underground_places, location)
-            else:
-                print(f"No places with between {min_reviews} and {max_reviews} reviews found for {location}.")
+        # Filter, score and sort in fixed-size batches so memory stays flat for large regions
+        filename = f'combined_places_{location.lower()}.csv'
+        with tempfile.TemporaryDirectory(prefix='places_') as staging_dir:
+            paths = stage_location(location, categories, staging_dir)
+            rows = 0
+            if paths:
+                rows = process_places(lambda: iter_csv_chunks(paths), filename,
+                                      min_reviews=min_reviews, max_reviews=max_reviews,
+                                      underground=args.underground, top_n=args.top_n)
+        if rows:
+            print(f"Saved {rows} filtered places for {location} to {filename}")
         else:
-            print(f"No places found for {location}.")
+            print(f"No places with between {min_reviews} and {max_reviews} reviews found for {location}.")
 
 if __name__ == "__main__":
     main()
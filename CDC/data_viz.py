@@ -1,32 +1,23 @@
 import pandas as pd
 import folium
 import streamlit as st
+import streamlit.components.v1 as components
 from streamlit_folium import st_folium
 import os
 from folium.plugins import HeatMap
-from optimal_route import (
-    compute_scores_underground,
-    select_top_locations,
-    prepare_locations,
-    solve_with_ors_optimization,
-    plot_route_on_map,
-    compute_scores,
-    fetch_places,
-    print_solution,
-    remove_traps
-)
+from itinerary_jobs import ItineraryJobQueue
+from route_payload import render_route_payload
+from chunked_places import iter_csv_chunks
 
 # Function to load data
 def load_data(csv_folder, location):
-    all_places = []
-    
-    for file in os.listdir(csv_folder):
-        if file.endswith(".csv") and location.lower() in file.lower():
-            file_path = os.path.join(csv_folder, file)
-            df = pd.read_csv(file_path)
-            all_places.extend(df.to_dict(orient='records'))
-    
-    df = pd.DataFrame(all_places)
+    paths = [
+        os.path.join(csv_folder, file) for file in os.listdir(csv_folder)
+        if file.endswith(".csv") and location.lower() in file.lower()
+    ]
+
+    # The map needs the whole city frame; reading in batches avoids the per-row dict round trip
+    df = pd.concat(iter_csv_chunks(paths), ignore_index=True)
     return df.sort_values(by=['polarity', 'numReviews'], ascending=[False, True])
 
 # Function to create map with optional heatmap and pins
@@ -72,6 +63,64 @@ def create_map(df, location, n_places, selected_categories, show_heatmap, show_p
     
     return folium_map
 
+# The itinerary form's default preferences for Rome, precomputed at startup
+WARM_UP_PREFS = [{
+    'city': 'Rome',
+    'categories': ['poi', 'attraction', 'restaurant', 'accommodation'],
+    'start_lat': 41.877134,
+    'start_lng': 12.492443,
+    'start_time': 480,
+    'end_time': 1000,
+    'mode_of_travel': 'driving-car',
+    'min_polarity': 4.0,
+    'min_num_reviews': 6,
+    'min_restaurants': 2,
+    'max_restaurants': 2,
+    'underground': False,
+    'remove_tourist': False,
+    'trip_date': None,
+    'time_budget': 10
+}]
+
+# Shared across all sessions so identical in-flight requests are computed once
+@st.cache_resource
+def get_job_queue():
+    queue = ItineraryJobQueue(max_workers=4)
+    # The first visitor who keeps the defaults then gets a cached itinerary
+    queue.warm_up(WARM_UP_PREFS, st.secrets['api_keys']['ors_api_key'], N=25)
+    return queue
+
+# Polls the queued itinerary job without blocking the rest of the page
+@st.fragment(run_every=1)
+def show_itinerary_progress():
+    job_id = st.session_state.get('itinerary_job')
+    if job_id is None:
+        return
+
+    job = get_job_queue().get(job_id)
+    if job is None:
+        del st.session_state['itinerary_job']
+        return
+
+    if not job.done():
+        st.info(f"{job.stage}...")
+        if job.provisional:
+            st.caption("First feasible route (still optimizing):")
+            st.write(job.provisional)
+        return
+
+    del st.session_state['itinerary_job']
+    result = job.result()
+    if result is None:
+        st.session_state.pop('route_payload', None)
+        st.session_state['itinerary_error'] = "No solution found."
+    else:
+        st.session_state.pop('itinerary_error', None)
+        st.session_state['route'] = result['route']
+        st.session_state['route_payload'] = result['payload']
+        st.session_state['solver_report'] = result.get('solver')
+    st.rerun()
+
 def main():
     st.title("Underground Spot Discovery Map")
 
@@ -113,6 +162,8 @@ def main():
         start_time = st.slider("Start Time (minutes from midnight)", 0, 1440, 480)
         end_time = st.slider("End Time (minutes from midnight)", 0, 1440, 1000)
         mode_of_travel = st.selectbox("Mode of Travel", ['driving-car', 'cycling-regular', 'foot-walking'])
+        trip_date = st.date_input("Trip Date", value=None)
+        time_budget = st.slider("Solver Time Budget (seconds)", min_value=1, max_value=30, value=10)
         min_polarity = st.slider("Minimum Polarity", min_value=0.0, max_value=9.0, value=4.0)
         min_num_reviews = st.slider("Minimum Number of Reviews", min_value=0, max_value=200, value=6)
         remove_tourist = st.checkbox("Remove Tourist Traps", value=False)
@@ -121,58 +172,42 @@ def main():
     calculate_route = st.button("Calculate Optimal Itinerary")
 
     if calculate_route:
-        if True:
-            # Define user preferences based on inputs
-            user_prefs = {
-                'city': location,
-                'categories': selected_categories,
-                'start_lat': start_lat,
-                'start_lng': start_lng,
-                'start_time': start_time,   # in minutes
-                'end_time': end_time,    # in minutes
-                'mode_of_travel': mode_of_travel,
-                'min_polarity': min_polarity,
-                'min_num_reviews': min_num_reviews,
-                'min_restaurants': 2,
-                'max_restaurants': 2,
-                'underground': underground,
-                'remove_tourist': remove_tourist
-            }
-
-            df = fetch_places(user_prefs['city'], user_prefs['categories'])
-            df = df.dropna(subset=['polarity', 'numReviews', 'lat', 'lng'])
-
-            if user_prefs['remove_tourist']:
-                df = remove_traps(df)
-
-            if user_prefs['underground']:
-                df = compute_scores_underground(df)
-            else:
-                df = compute_scores(df)
-
-            df_top = select_top_locations(df, user_prefs, N=25)
-
-            locations = prepare_locations(df_top, user_prefs)
-
-            ORS_API_KEY = st.secrets['api_keys']['ors_api_key'] # Replace with your OpenRouteService API key
-            route, steps_info = solve_with_ors_optimization(locations, user_prefs, ORS_API_KEY)
-
-            if route and steps_info:
-            # Print solution with arrival times
-                st.session_state['route'] = print_solution(locations, steps_info, user_prefs)
-                # Plot the route on a map
-                optimized_map = plot_route_on_map(locations, steps_info, user_prefs['mode_of_travel'], api_key=ORS_API_KEY)
-                st.session_state['optimized_map'] = optimized_map
-            else:
-                print("No solution found.")
-        
-        if 'optimized_map' in st.session_state:
-            st.write(st.session_state['route'])
-            st_folium(st.session_state['optimized_map'], width=700, height=500)
-    else:
-        if 'optimized_map' in st.session_state:
-            st.write(st.session_state['route'])
-            st_folium(st.session_state['optimized_map'], width=700, height=500)
+        # Define user preferences based on inputs
+        user_prefs = {
+            'city': location,
+            'categories': list(selected_categories),
+            'start_lat': start_lat,
+            'start_lng': start_lng,
+            'start_time': start_time,   # in minutes
+            'end_time': end_time,    # in minutes
+            'mode_of_travel': mode_of_travel,
+            'min_polarity': min_polarity,
+            'min_num_reviews': min_num_reviews,
+            'min_restaurants': 2,
+            'max_restaurants': 2,
+            'underground': underground,
+            'remove_tourist': remove_tourist,
+            'trip_date': trip_date.isoformat() if trip_date else None,
+            'time_budget': time_budget
+        }
+
+        ORS_API_KEY = st.secrets['api_keys']['ors_api_key'] # Replace with your OpenRouteService API key
+        st.session_state['itinerary_job'] = get_job_queue().submit(user_prefs, ORS_API_KEY, N=25)
+
+    show_itinerary_progress()
+
+    if 'itinerary_error' in st.session_state:
+        st.error(st.session_state['itinerary_error'])
+
+    if 'route_payload' in st.session_state:
+        st.write(st.session_state['route'])
+        components.html(render_route_payload(st.session_state['route_payload']), width=700, height=500)
+        report = st.session_state.get('solver_report')
+        if report:
+            st.caption(
+                f"Solved by {report['backend']} in {report['elapsed']}s "
+                f"(budget {report['budget']}s), visiting {report['visited']} of {report['candidates']} places"
+            )
 
 if __name__ == "__main__":
     main()
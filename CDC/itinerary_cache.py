@@ -0,0 +1,94 @@
+import math
+import threading
+
+from cachetools import TTLCache
+
+from optimal_route import print_solution
+from review_features import trip_month
+
+METRES_PER_DEGREE = 111320.0
+
+
+def itinerary_signature(user_prefs, grid_m=200, time_step=15):
+    """Quantized cache key for a set of itinerary preferences.
+
+    The start point is snapped to a `grid_m` metre grid cell and the start/end
+    times are rounded to `time_step` minutes; everything else must match exactly.
+    """
+    lat = user_prefs['start_lat']
+    lng = user_prefs['start_lng']
+    lat_cell = math.floor(lat * METRES_PER_DEGREE / grid_m)
+    lng_cell = math.floor(lng * METRES_PER_DEGREE * math.cos(math.radians(lat)) / grid_m)
+    return (
+        user_prefs['city'].lower(),
+        tuple(sorted(cat.lower() for cat in user_prefs['categories'])),
+        user_prefs['mode_of_travel'],
+        float(user_prefs['min_polarity']),
+        int(user_prefs['min_num_reviews']),
+        user_prefs.get('min_restaurants', 2),
+        user_prefs.get('max_restaurants', 2),
+        bool(user_prefs['underground']),
+        bool(user_prefs['remove_tourist']),
+        lat_cell,
+        lng_cell,
+        round(user_prefs['start_time'] / time_step),
+        round(user_prefs['end_time'] / time_step),
+        # Seasonality scoring only depends on the trip month
+        trip_month(user_prefs.get('trip_date'))
+    )
+
+
+def retime_result(result, user_prefs):
+    """Shift a cached itinerary to a new start time without re-solving.
+
+    Every arrival moves by the difference in start time. Returns None if the
+    shifted route would no longer fit in the requested time window.
+    """
+    delta = (user_prefs['start_time'] - result['start_time']) * 60
+    if delta == 0:
+        return result
+
+    steps_info = result['steps_info'].copy()
+    steps_info['arrival'] += delta
+    if steps_info['arrival'].min() < 0 or steps_info['arrival'].max() > user_prefs['end_time'] * 60:
+        return None
+
+    retimed = dict(result)
+    retimed['steps_info'] = steps_info
+    retimed['start_time'] = user_prefs['start_time']
+    retimed['route'] = print_solution(result['locations'], steps_info, user_prefs)
+    return retimed
+
+
+class ItineraryCache:
+    """Thread-safe LRU cache with TTL for computed itineraries, keyed on `itinerary_signature`.
+
+    Results are the dicts returned by `run_itinerary`; hits with a slightly
+    different start time are re-timed rather than recomputed.
+    """
+
+    def __init__(self, maxsize=512, ttl=6 * 3600, grid_m=200, time_step=15):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.grid_m = grid_m
+        self.time_step = time_step
+        self.lock = threading.Lock()
+
+    def key(self, user_prefs, N):
+        return itinerary_signature(user_prefs, self.grid_m, self.time_step) + (N,)
+
+    def get(self, user_prefs, N):
+        """Return a cached (re-timed) result for these preferences, or None."""
+        with self.lock:
+            result = self.cache.get(self.key(user_prefs, N))
+        if result is None:
+            return None
+        return retime_result(result, user_prefs)
+
+    def put(self, user_prefs, N, result):
+        if result is None:
+            return
+        # Local fallback routes (ORS missed the deadline) are not cached, so the next request retries ORS
+        if (result.get('solver') or {}).get('backend') == 'local':
+            return
+        with self.lock:
+            self.cache[self.key(user_prefs, N)] = result
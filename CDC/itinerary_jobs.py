@@ -0,0 +1,223 @@
+import json
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from cachetools import TTLCache
+
+from optimal_route import (
+    compute_scores_underground,
+    select_top_locations_indexed,
+    prepare_locations,
+    solve_with_ors_optimization,
+    compute_scores,
+    fetch_places,
+    print_solution,
+    remove_traps
+)
+from local_routing import load_city_graph
+from route_payload import build_route_payload
+from itinerary_cache import ItineraryCache
+from travel_time_store import load_travel_time_store
+from review_features import load_review_features, trip_month
+from anytime_solver import solve_anytime
+from place_index import PlaceIndex
+
+# Scored-and-indexed city frames, so threshold slider changes skip fetching and scoring
+_place_indexes = TTLCache(maxsize=64, ttl=3600)
+_place_indexes_lock = threading.Lock()
+
+
+def scoring_key(user_prefs):
+    """Everything that changes the scored frame (but not the threshold filters)."""
+    return (
+        user_prefs['city'].lower(),
+        tuple(sorted(cat.lower() for cat in user_prefs['categories'])),
+        bool(user_prefs['underground']),
+        bool(user_prefs['remove_tourist']),
+        trip_month(user_prefs.get('trip_date'))
+    )
+
+
+def scored_place_index(user_prefs, places=None, stage=None):
+    """Fetch, clean and score the city's places and wrap them in a PlaceIndex (cached)."""
+    key = scoring_key(user_prefs)
+    with _place_indexes_lock:
+        index = _place_indexes.get(key)
+    if index is not None:
+        return index
+
+    if stage is not None:
+        stage('Fetching places')
+    df = places if places is not None else fetch_places(user_prefs['city'], user_prefs['categories'])
+    df = df.dropna(subset=['polarity', 'numReviews', 'lat', 'lng'])
+
+    if stage is not None:
+        stage('Scoring places')
+    if user_prefs['remove_tourist']:
+        df = remove_traps(df)
+
+    # Seasonality only applies when a trip date is set and the city has a feature file
+    features = load_review_features(user_prefs['city'])
+    trip_date = user_prefs.get('trip_date')
+    if user_prefs['underground']:
+        df = compute_scores_underground(df, features=features, trip_date=trip_date)
+    else:
+        df = compute_scores(df, features=features, trip_date=trip_date)
+
+    index = PlaceIndex(df)
+    with _place_indexes_lock:
+        _place_indexes[key] = index
+    return index
+
+
+def run_itinerary(user_prefs, api_key, N=25, progress=None, places=None, with_payload=True, executor=None,
+                  on_provisional=None):
+    """Run the full itinerary pipeline and return {'route': text, 'payload': map payload}.
+
+    The result also carries the LocationSet, steps and start time so it can be
+    re-timed from the itinerary cache. `progress` is called with the name of
+    each stage as it starts. `places` can supply an already fetched city frame,
+    and `with_payload=False` skips the directions call for the map.
+    `executor` is passed to solve_anytime for the background ORS call, and
+    with a time budget `on_provisional` is called with the itinerary text of
+    the first feasible (greedy) route while the solver keeps improving it.
+    Returns None if no solution was found.
+    """
+    def stage(name):
+        if progress is not None:
+            progress(name)
+
+    index = scored_place_index(user_prefs, places=places, stage=stage)
+    df_top = select_top_locations_indexed(index, user_prefs, N=N)
+    locations = prepare_locations(df_top, user_prefs)
+
+    stage('Optimizing route')
+    # None unless CDC/graphs/<city>.<profile>.npz exists
+    graph = load_city_graph(user_prefs['city'], user_prefs['mode_of_travel'])
+    store = load_travel_time_store(user_prefs['mode_of_travel']) if graph is None else None
+    report = None
+    if user_prefs.get('time_budget'):
+        on_update = None
+        if on_provisional is not None:
+            def on_update(route, steps_info):
+                on_provisional(print_solution(locations, steps_info, user_prefs))
+        route, steps_info, report = solve_anytime(locations, user_prefs, api_key, graph=graph, store=store,
+                                                  on_update=on_update, executor=executor)
+    else:
+        route, steps_info = solve_with_ors_optimization(locations, user_prefs, api_key, graph=graph, store=store)
+    if not route:
+        print("No solution found.")
+        return None
+
+    stage('Drawing map')
+    text = print_solution(locations, steps_info, user_prefs)
+    payload = None
+    if with_payload:
+        payload = build_route_payload(locations, steps_info, user_prefs['mode_of_travel'], api_key=api_key, graph=graph)
+    return {
+        'route': text,
+        'payload': payload,
+        'locations': locations,
+        'steps_info': steps_info,
+        'start_time': user_prefs['start_time'],
+        'solver': report
+    }
+
+
+class ItineraryJob:
+    """A queued itinerary computation shared by every session that requested it."""
+
+    def __init__(self, job_id, key):
+        self.id = job_id
+        self.key = key
+        self.stage = 'Queued'
+        # Itinerary text of the greedy route, shown while the solver is still running
+        self.provisional = None
+        self.future = None
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        """Return the pipeline result, or None if it failed or found no route."""
+        try:
+            return self.future.result()
+        except Exception as e:
+            print(f"Itinerary job {self.id} failed:", e)
+            return None
+
+
+class ItineraryJobQueue:
+    """Runs itinerary pipelines on a shared thread pool.
+
+    Identical requests submitted while one is still running are coalesced onto
+    the same job, so they are computed only once. Finished results go into an
+    ItineraryCache, so near-identical later requests complete immediately.
+    """
+
+    def __init__(self, max_workers=4, max_finished=256, cache=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='itinerary')
+        self.max_finished = max_finished
+        self.cache = cache if cache is not None else ItineraryCache()
+        self.jobs = {}
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def request_key(user_prefs, N):
+        return json.dumps([user_prefs, N], sort_keys=True, default=str)
+
+    def submit(self, user_prefs, api_key, N=25):
+        """Queue an itinerary and return its job id."""
+        key = self.request_key(user_prefs, N)
+        cached = self.cache.get(user_prefs, N)
+        with self.lock:
+            self._prune()
+            if cached is not None:
+                job = ItineraryJob(uuid.uuid4().hex, key)
+                job.stage = 'Done'
+                job.future = Future()
+                job.future.set_result(cached)
+                self.jobs[job.id] = job
+                return job.id
+
+            job_id = self.in_flight.get(key)
+            if job_id is not None:
+                return job_id
+
+            job = ItineraryJob(uuid.uuid4().hex, key)
+            self.jobs[job.id] = job
+            self.in_flight[key] = job.id
+            job.future = self.executor.submit(self._run, job, dict(user_prefs), api_key, N)
+            return job.id
+
+    def warm_up(self, prefs_list, api_key, N=25):
+        """Queue itineraries for popular preference sets so later requests hit the cache."""
+        return [self.submit(user_prefs, api_key, N=N) for user_prefs in prefs_list]
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job, user_prefs, api_key, N):
+        def progress(name):
+            job.stage = name
+
+        def provisional(text):
+            job.provisional = text
+
+        try:
+            result = run_itinerary(user_prefs, api_key, N=N, progress=progress, on_provisional=provisional)
+            self.cache.put(user_prefs, N, result)
+            return result
+        finally:
+            job.stage = 'Done'
+            with self.lock:
+                self.in_flight.pop(job.key, None)
+
+    def _prune(self):
+        # Drop the oldest finished jobs; dicts keep insertion order
+        finished = [job_id for job_id, job in self.jobs.items() if job.future.done()]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
@@ -0,0 +1,286 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+# Average travel speeds (metres per second) used to turn edge lengths into times
+PROFILE_SPEEDS = {
+    'driving-car': 40 / 3.6,
+    'cycling-regular': 15 / 3.6,
+    'foot-walking': 5 / 3.6
+}
+
+# Travel time reported for unreachable pairs (one week, in seconds)
+UNREACHABLE_SECONDS = 7 * 24 * 3600
+
+GRAPH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'graphs')
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def haversine_m(lng1, lat1, lng2, lat2):
+    """Great-circle distance in metres; works on scalars and NumPy arrays."""
+    lng1, lat1, lng2, lat2 = map(np.radians, (lng1, lat1, lng2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def straight_line_duration_matrix(coords, profile, detour=1.3):
+    """Rough travel times in whole seconds from great-circle distances.
+
+    Used when neither a routing graph nor ORS is available; `detour` scales
+    straight-line distance up to a typical road distance.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    speed = PROFILE_SPEEDS.get(profile, PROFILE_SPEEDS['foot-walking'])
+    distances = haversine_m(coords[:, None, 0], coords[:, None, 1], coords[None, :, 0], coords[None, :, 1])
+    return np.rint(distances * detour / speed).astype(np.int64)
+
+
+class RoutingGraph:
+    """Road network stored as a CSR adjacency structure.
+
+    `node_coords` is an (n, 2) array of (lng, lat). The outgoing edges of node i
+    are `indices[indptr[i]:indptr[i + 1]]` with lengths in metres in `lengths`.
+    """
+
+    def __init__(self, node_coords, indptr, indices, lengths):
+        self.node_coords = np.asarray(node_coords, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.lengths = np.asarray(lengths, dtype=np.float32)
+        # Scale for an equirectangular projection around the graph's mean latitude
+        self._cos_lat = float(np.cos(np.radians(self.node_coords[:, 1].mean()))) if len(self.node_coords) else 1.0
+        self._csgraph = None
+        self._tree = None
+
+    @classmethod
+    def from_edges(cls, node_coords, src, dst, lengths=None):
+        """Build a graph from parallel edge arrays (directed src -> dst)."""
+        node_coords = np.asarray(node_coords, dtype=np.float64)
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        if lengths is None:
+            lengths = haversine_m(node_coords[src, 0], node_coords[src, 1],
+                                  node_coords[dst, 0], node_coords[dst, 1])
+        lengths = np.asarray(lengths, dtype=np.float32)
+
+        order = np.argsort(src, kind='stable')
+        counts = np.bincount(src, minlength=len(node_coords))
+        indptr = np.concatenate(([0], np.cumsum(counts)))
+        return cls(node_coords, indptr, dst[order], lengths[order])
+
+    @classmethod
+    def load(cls, path):
+        """Load a graph saved with `save`."""
+        with np.load(path) as data:
+            return cls(data['node_coords'], data['indptr'], data['indices'], data['lengths'])
+
+    def save(self, path):
+        np.savez_compressed(path, node_coords=self.node_coords, indptr=self.indptr,
+                            indices=self.indices, lengths=self.lengths)
+
+    def __len__(self):
+        return len(self.node_coords)
+
+    def _graph(self):
+        # scipy's csgraph sums parallel edges and drops zero-length ones, so keep
+        # only the shortest edge per node pair and give zero lengths a tiny weight
+        if self._csgraph is None:
+            n = len(self.node_coords)
+            src = np.repeat(np.arange(n), np.diff(self.indptr))
+            order = np.lexsort((self.lengths, self.indices, src))
+            src, dst, lengths = src[order], self.indices[order], self.lengths[order].astype(np.float64)
+            first = np.ones(len(src), dtype=bool)
+            first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+            lengths = np.maximum(lengths[first], 1e-3)
+            self._csgraph = csr_matrix((lengths, (src[first], dst[first])), shape=(n, n))
+        return self._csgraph
+
+    def _projected(self, coords):
+        return np.column_stack((coords[:, 0] * self._cos_lat, coords[:, 1]))
+
+    def snap(self, coords):
+        """Return the nearest node index and snap distance (m) for each (lng, lat)."""
+        coords = np.atleast_2d(np.asarray(coords, dtype=np.float64))
+        if self._tree is None:
+            self._tree = cKDTree(self._projected(self.node_coords))
+        _, node_idx = self._tree.query(self._projected(coords))
+        node_idx = np.asarray(node_idx, dtype=np.int64)
+        nearest = self.node_coords[node_idx]
+        snap_dist = haversine_m(coords[:, 0], coords[:, 1], nearest[:, 0], nearest[:, 1])
+        return node_idx, snap_dist
+
+    def shortest_paths(self, sources, return_predecessors=False):
+        """Compiled many-to-many Dijkstra from each node in `sources`.
+
+        Returns a (len(sources), n) array of distances in metres (inf if
+        unreachable) and, if requested, the predecessor array (-9999 = none).
+        """
+        return dijkstra(self._graph(), directed=True, indices=np.asarray(sources, dtype=np.int64),
+                        return_predecessors=return_predecessors)
+
+    def distance_matrix(self, coords):
+        """Many-to-many road distances in metres between (lng, lat) points.
+
+        Runs one Dijkstra per distinct snapped source node, all in a single
+        compiled call. Snap distances to the network are added to both ends.
+        """
+        node_idx, snap_dist = self.snap(coords)
+        sources, rows = np.unique(node_idx, return_inverse=True)
+        dist = self.shortest_paths(sources)
+        matrix = dist[rows][:, node_idx]
+        matrix += snap_dist[:, None] + snap_dist[None, :]
+        np.fill_diagonal(matrix, 0.0)
+        return matrix
+
+    def duration_matrix(self, coords, profile):
+        """Many-to-many travel times in whole seconds for an ORS profile."""
+        speed = PROFILE_SPEEDS.get(profile, PROFILE_SPEEDS['foot-walking'])
+        durations = self.distance_matrix(coords) / speed
+        durations[~np.isfinite(durations)] = UNREACHABLE_SECONDS
+        return np.rint(durations).astype(np.int64)
+
+    def route_geometry(self, coords):
+        """Polyline through consecutive (lng, lat) waypoints as a list of [lng, lat].
+
+        Unreachable legs fall back to a straight segment.
+        """
+        coords = np.atleast_2d(np.asarray(coords, dtype=np.float64))
+        node_idx, _ = self.snap(coords)
+        geometry = [coords[0].tolist()]
+        if len(coords) < 2:
+            return geometry
+        sources, rows = np.unique(node_idx[:-1], return_inverse=True)
+        _, pred = self.shortest_paths(sources, return_predecessors=True)
+        for leg in range(len(coords) - 1):
+            a, b = int(node_idx[leg]), int(node_idx[leg + 1])
+            leg_pred = pred[rows[leg]]
+            if a == b or leg_pred[b] >= 0:
+                path = [b]
+                while path[-1] != a:
+                    path.append(int(leg_pred[path[-1]]))
+                geometry.extend(self.node_coords[path[::-1]].tolist())
+            geometry.append(coords[leg + 1].tolist())
+        return geometry
+
+
+# highway=* values each profile may use (tags like foot=yes / bicycle=yes can add more)
+PROFILE_HIGHWAYS = {
+    'driving-car': {
+        'motorway', 'motorway_link', 'trunk', 'trunk_link', 'primary', 'primary_link',
+        'secondary', 'secondary_link', 'tertiary', 'tertiary_link', 'unclassified',
+        'residential', 'living_street', 'service', 'road'
+    },
+    'cycling-regular': {
+        'primary', 'primary_link', 'secondary', 'secondary_link', 'tertiary', 'tertiary_link',
+        'unclassified', 'residential', 'living_street', 'service', 'road', 'cycleway',
+        'track', 'path'
+    },
+    'foot-walking': {
+        'primary', 'primary_link', 'secondary', 'secondary_link', 'tertiary', 'tertiary_link',
+        'unclassified', 'residential', 'living_street', 'service', 'road', 'pedestrian',
+        'footway', 'path', 'steps', 'track', 'cycleway'
+    }
+}
+
+# Access tags that can open or close a way for each profile
+PROFILE_ACCESS_TAGS = {
+    'driving-car': ('motor_vehicle', 'motorcar'),
+    'cycling-regular': ('bicycle',),
+    'foot-walking': ('foot',)
+}
+
+
+def way_allowed(tags, profile):
+    """Whether a way with these OSM tags can be used by the given ORS profile."""
+    highway = tags.get('highway')
+    if highway is None:
+        return False
+    for key in PROFILE_ACCESS_TAGS[profile]:
+        value = tags.get(key)
+        if value in ('no', 'private'):
+            return False
+        if value in ('yes', 'designated', 'permissive'):
+            return True
+    if tags.get('access') in ('no', 'private'):
+        return False
+    return highway in PROFILE_HIGHWAYS[profile]
+
+
+def way_direction(tags, profile):
+    """Allowed travel direction along a way: 1 forward only, -1 backward only, 0 both."""
+    if profile == 'foot-walking':
+        return 0
+    if profile == 'cycling-regular' and tags.get('oneway:bicycle') == 'no':
+        return 0
+    oneway = tags.get('oneway')
+    if oneway in ('yes', '1', 'true'):
+        return 1
+    if oneway in ('-1', 'reverse'):
+        return -1
+    # Roundabouts are implicitly one-way unless tagged otherwise
+    if oneway is None and tags.get('junction') == 'roundabout':
+        return 1
+    return 0
+
+
+def build_graph_from_osm(pbf_path, profile):
+    """Build a RoutingGraph for one ORS profile from an OSM PBF extract.
+
+    Only ways usable by `profile` are kept and one-way restrictions are applied
+    for vehicles. Requires the `osmium` package.
+    """
+    try:
+        import osmium
+    except ImportError as e:
+        raise ImportError("Building a routing graph from OSM needs 'osmium' (pip install osmium)") from e
+
+    class WayHandler(osmium.SimpleHandler):
+        def __init__(self):
+            super().__init__()
+            self.node_ids = {}
+            self.coords = []
+            self.src = []
+            self.dst = []
+
+        def _node(self, node_ref):
+            idx = self.node_ids.get(node_ref.ref)
+            if idx is None:
+                idx = len(self.coords)
+                self.node_ids[node_ref.ref] = idx
+                self.coords.append((node_ref.lon, node_ref.lat))
+            return idx
+
+        def way(self, w):
+            if not way_allowed(w.tags, profile):
+                return
+            direction = way_direction(w.tags, profile)
+            nodes = [self._node(n) for n in w.nodes if n.location.valid()]
+            for a, b in zip(nodes, nodes[1:]):
+                if direction >= 0:
+                    self.src.append(a)
+                    self.dst.append(b)
+                if direction <= 0:
+                    self.src.append(b)
+                    self.dst.append(a)
+
+    handler = WayHandler()
+    handler.apply_file(pbf_path, locations=True)
+    return RoutingGraph.from_edges(handler.coords, handler.src, handler.dst)
+
+
+def graph_path(city, profile, graph_dir=GRAPH_DIR):
+    return os.path.join(graph_dir, f"{city.lower()}.{profile}.npz")
+
+
+@lru_cache(maxsize=8)
+def load_city_graph(city, profile, graph_dir=GRAPH_DIR):
+    """Load a city's graph for a profile from `graph_dir/<city>.<profile>.npz`, or None if absent."""
+    path = graph_path(city, profile, graph_dir)
+    if not os.path.exists(path):
+        return None
+    return RoutingGraph.load(path)
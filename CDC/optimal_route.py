@@ -1,9 +1,19 @@
+import os
+import time
+
 import requests
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 import openrouteservice
 import folium
 from datetime import datetime, timedelta
+from single_flight import SingleFlight
+from local_routing import UNREACHABLE_SECONDS
+from travel_time_store import missing_pairs
+
+# Resolved from this file so the app (run from the repo root) and CLIs run from CDC/ both find it
+TOURIST_TRAPS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tourist_traps.csv')
 
 CATEGORY_VISIT_DURATIONS = {
     'poi': 30,
@@ -12,14 +22,23 @@ CATEGORY_VISIT_DURATIONS = {
     'accommodation': 60
 }
 
-def fetch_places(city, categories):
+# Concurrent identical upstream requests (e.g. several sessions picking the same city) share one call
+_places_flight = SingleFlight()
+_directions_flight = SingleFlight()
+
+def _fetch_category(city, category):
     url = 'http://tour-pedia.org/api/getPlaces'
+    params = {'location': city, 'category': category}
+    response = requests.get(url, params=params)
+    if response.status_code == 200:
+        return response.json()
+    return []
+
+def fetch_places(city, categories):
     places = []
     for category in tqdm(categories, desc="Processing Categories"):
-        params = {'location': city, 'category': category.strip()}
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            places.extend(response.json())
+        category = category.strip()
+        places.extend(_places_flight.do((city, category), _fetch_category, city, category))
 
     df = pd.DataFrame(places)
     
@@ -35,7 +54,19 @@ def normalize_series(series):
         return series - min_val
     return (series - min_val) / (max_val - min_val)
 
-def compute_scores(df):
+def add_seasonality_score(df, features, trip_date, weight=0.2):
+    """Boost places whose reviews are concentrated in the trip month.
+
+    Uses the precomputed monthly histograms in a ReviewFeatures store;
+    places missing from the store count as typical.
+    """
+    seasonality = features.seasonality(trip_date)
+    df['seasonality'] = df['id'].astype(str).map(seasonality).fillna(1.0)
+    df['normalized_seasonality'] = normalize_series(df['seasonality'])
+    df['overall_score'] = df['overall_score'] + weight * df['normalized_seasonality']
+    return df
+
+def compute_scores(df, features=None, trip_date=None):
     """Compute normalized scores and overall score for each location."""
 
     df['normalized_polarity'] = normalize_series(df['polarity'])
@@ -43,9 +74,12 @@ def compute_scores(df):
 
     df['overall_score'] = 0.7 * df['normalized_polarity'] + 1.5 * df['normalized_numReviews']
 
+    if features is not None and trip_date is not None:
+        df = add_seasonality_score(df, features, trip_date)
+
     return df
 
-def compute_scores_underground(df):
+def compute_scores_underground(df, features=None, trip_date=None):
     """
     Compute normalized scores and overall score for each location,
     favoring high polarity and low number of reviews.
@@ -56,12 +90,15 @@ def compute_scores_underground(df):
     df['normalized_numReviews_inverse'] = 1 - df['normalized_numReviews']
     
     df['overall_score'] = 0.7 * df['normalized_polarity'] + 0.3 * df['normalized_numReviews_inverse']
+
+    if features is not None and trip_date is not None:
+        df = add_seasonality_score(df, features, trip_date)
     
     return df
 
 def remove_traps(df):
 
-    traps = pd.read_csv("CDC/tourist_traps.csv")
+    traps = pd.read_csv(TOURIST_TRAPS_PATH)
     trap_ids = traps['id'].tolist()
 
     print(len(df))
@@ -71,6 +108,37 @@ def remove_traps(df):
     return cleaned_df
 
 
+def select_top_locations_indexed(index, user_prefs, N=20):
+    """Same selection as select_top_locations, answered from a PlaceIndex.
+
+    The thresholds are looked up in the index's blocks instead of filtering
+    and sorting the whole scored frame (`index.frame`).
+    """
+    min_polarity = user_prefs['min_polarity']
+    min_num_reviews = user_prefs['min_num_reviews']
+    has_restaurant = 'restaurant' in [cat.lower() for cat in user_prefs['categories']]
+
+    if has_restaurant:
+        min_rest = user_prefs.get('min_restaurants', 2)
+        max_rest = user_prefs.get('max_restaurants', 2)
+
+        selected_restaurants = index.top(['restaurant'], min_polarity, min_num_reviews, max_rest)
+        if len(selected_restaurants) < min_rest:
+            print(f"Only {len(selected_restaurants)} restaurants available, which is less than the minimum required ({min_rest}).")
+
+        others = [cat for cat in index.categories if cat != 'restaurant']
+        remaining_slots = N - len(selected_restaurants)
+        selected_non_restaurants = index.top(others, min_polarity, min_num_reviews, remaining_slots)
+
+        df_top = pd.concat([selected_restaurants, selected_non_restaurants]).drop_duplicates().reset_index(drop=True)
+
+        actual_rest = len(df_top[df_top['category'].str.lower() == 'restaurant'])
+        if actual_rest < min_rest:
+            print(f"Warning: Only {actual_rest} restaurants selected, which is less than the desired minimum ({min_rest}).")
+        return df_top
+
+    return index.top(index.categories, min_polarity, min_num_reviews, N).reset_index(drop=True)
+
 def select_top_locations(df, user_prefs, N=20):
     """Select top N locations based on the overall score and user preferences.
     
@@ -112,47 +180,197 @@ def select_top_locations(df, user_prefs, N=20):
     
     return df_top
 
+STEP_DTYPE = np.dtype([
+    ('type', 'U5'),
+    ('location_idx', np.int32),
+    ('arrival', np.int64)
+])
+
+class LocationSet:
+    """Struct-of-arrays view of the start location followed by the selected places.
+
+    Row 0 is always the start location. Coordinates are kept in a single (n, 2)
+    float array in ORS order (lng, lat); `lng` and `lat` are views into it.
+    """
+
+    __slots__ = ('frame', 'ids', 'names', 'coords', 'visit_duration',
+                 'category', 'numReviews', 'polarity')
+
+    def __init__(self, frame, ids, names, coords, visit_duration, category, numReviews, polarity):
+        self.frame = frame
+        self.ids = ids
+        self.names = names
+        self.coords = coords
+        self.visit_duration = visit_duration
+        self.category = category
+        self.numReviews = numReviews
+        self.polarity = polarity
+
+    @property
+    def lng(self):
+        return self.coords[:, 0]
+
+    @property
+    def lat(self):
+        return self.coords[:, 1]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, idx):
+        """Return a single location as a plain dict (for display and export)."""
+        return {
+            'id': self.ids[idx],
+            'name': self.names[idx],
+            'lat': float(self.coords[idx, 1]),
+            'lng': float(self.coords[idx, 0]),
+            'visit_duration': int(self.visit_duration[idx]),
+            'category': self.category[idx],
+            'numReviews': int(self.numReviews[idx]),
+            'polarity': float(self.polarity[idx])
+        }
+
 def prepare_locations(df_top, user_prefs):
-    """Prepare locations list including the start location."""
-    start_location = {
-        'id': 'start',
-        'name': 'Start Location',
-        'lat': user_prefs['start_lat'],
-        'lng': user_prefs['start_lng'],
-        'visit_duration': 0,
-        'category': 'start',
-        'numReviews': 0,
-        'polarity': 0
+    """Prepare a LocationSet including the start location as row 0."""
+    n = len(df_top) + 1
+
+    coords = np.empty((n, 2), dtype=np.float64)
+    coords[0] = (user_prefs['start_lng'], user_prefs['start_lat'])
+    coords[1:, 0] = df_top['lng'].to_numpy(dtype=np.float64)
+    coords[1:, 1] = df_top['lat'].to_numpy(dtype=np.float64)
+
+    categories = df_top['category'].astype(str)
+    visit_duration = np.empty(n, dtype=np.int32)
+    visit_duration[0] = 0
+    visit_duration[1:] = categories.str.lower().map(CATEGORY_VISIT_DURATIONS).fillna(30).to_numpy()
+
+    num_reviews = np.empty(n, dtype=np.int64)
+    num_reviews[0] = 0
+    num_reviews[1:] = df_top['numReviews'].fillna(0).to_numpy(dtype=np.int64)
+
+    polarity = np.empty(n, dtype=np.float64)
+    polarity[0] = 0.0
+    polarity[1:] = df_top['polarity'].fillna(0.0).to_numpy(dtype=np.float64)
+
+    ids = np.empty(n, dtype=object)
+    ids[0] = 'start'
+    ids[1:] = df_top['id'].to_numpy()
+
+    names = np.empty(n, dtype=object)
+    names[0] = 'Start Location'
+    names[1:] = df_top['name'].to_numpy()
+
+    category = np.empty(n, dtype=object)
+    category[0] = 'start'
+    category[1:] = categories.to_numpy()
+
+    return LocationSet(df_top, ids, names, coords, visit_duration, category, num_reviews, polarity)
+
+def request_timeout(timeout=None, deadline=None):
+    """Seconds allowed for the next HTTP call: `timeout`, capped by what is left
+    until `deadline` (a time.monotonic value). Raises requests' Timeout once it has passed."""
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise requests.exceptions.Timeout("solver deadline has passed")
+    return remaining if timeout is None else min(timeout, remaining)
+
+def fetch_duration_matrix(coords, profile, api_key, sources, destinations, timeout=None, deadline=None):
+    """Fetch a sources x destinations block of travel times (seconds) from the ORS matrix API."""
+    url = f'https://api.openrouteservice.org/v2/matrix/{profile}'
+    headers = {
+        'Authorization': api_key,
+        'Content-Type': 'application/json'
     }
-    locations = [start_location]
-    for index, row in df_top.iterrows():
-        category = row['category'].lower()
-        visit_duration = CATEGORY_VISIT_DURATIONS.get(category, 30)
-        loc = {
-            'id': row['id'],
-            'name': row['name'],
-            'lat': row['lat'],
-            'lng': row['lng'],
-            'visit_duration': visit_duration,
-            'category': row['category'],
-            'numReviews': int(row['numReviews']) if not pd.isna(row['numReviews']) else 0,
-            'polarity': float(row['polarity']) if not pd.isna(row['polarity']) else 0.0
-        }
-        locations.append(loc)
-    return locations
+    request_json = {
+        'locations': coords,
+        'sources': sources,
+        'destinations': destinations,
+        'metrics': ['duration']
+    }
+    try:
+        response = requests.post(url, json=request_json, headers=headers, timeout=request_timeout(timeout, deadline))
+    except requests.exceptions.RequestException as e:
+        print("ORS Matrix API request failed:", e)
+        return None
+    if response.status_code != 200:
+        print("ORS Matrix API error:", response.text)
+        return None
+    rows = response.json().get('durations', [])
+    return np.array([[UNREACHABLE_SECONDS if d is None else d for d in row] for row in rows], dtype=np.float64)
+
+def _fetch_and_store(coords, profile, api_key, store, place_ids, durations, rows, cols, timeout=None, deadline=None):
+    """Fetch rows x cols into `durations` and store the place-to-place part of the block.
+
+    Index 0 is the start location, which is never stored. Returns False if the call fails.
+    """
+    block = fetch_duration_matrix(coords, profile, api_key, rows, cols, timeout=timeout, deadline=deadline)
+    if block is None:
+        return False
+    durations[np.ix_(rows, cols)] = block
+    rows, cols = np.asarray(rows), np.asarray(cols)
+    place_rows, place_cols = rows > 0, cols > 0
+    if place_rows.any() and place_cols.any():
+        store.update(place_ids, rows[place_rows] - 1, cols[place_cols] - 1,
+                     block[np.ix_(place_rows, place_cols)])
+    return True
+
+def cached_duration_matrix(locations, profile, api_key, store, timeout=None, deadline=None):
+    """Travel-time matrix for a LocationSet, reusing every place pair already in `store`.
+
+    At most two batched matrix calls are made: one for the start row plus the
+    rows of places the store has never seen, then one for the remaining
+    unknown rows x columns (including the start column). Only place-to-place
+    pairs are stored; start pairs depend on the user's position and are
+    fetched per request. Returns None if a matrix call fails.
+    """
+    n = len(locations)
+    place_ids = [str(place_id) for place_id in locations.ids[1:]]
+    durations = np.full((n, n), np.nan)
+    durations[1:, 1:] = store.lookup(place_ids)
+    durations[0, 0] = 0.0
+    coords = locations.coords.tolist()
+    if n < 2:
+        return np.rint(durations).astype(np.int64)
+
+    # Start row and never-seen places: full rows
+    unknown_places = np.isnan(durations[1:, 1:]).sum(axis=1) >= n - 2
+    fresh = [0] + (np.flatnonzero(unknown_places) + 1).tolist()
+    if not _fetch_and_store(coords, profile, api_key, store, place_ids, durations,
+                            fresh, list(range(n)), timeout=timeout, deadline=deadline):
+        return None
+
+    # Whatever is still unknown, e.g. the start column and new places seen from old ones
+    rows, cols = missing_pairs(durations)
+    if rows:
+        if not _fetch_and_store(coords, profile, api_key, store, place_ids, durations,
+                                rows, cols, timeout=timeout, deadline=deadline):
+            return None
+    return np.rint(durations).astype(np.int64)
 
 # This method was created using AI assistance for accessing the API
-def solve_with_ors_optimization(locations, user_prefs, api_key):
-    """Solve the routing problem using ORS optimization endpoint."""
+def solve_with_ors_optimization(locations, user_prefs, api_key, graph=None, store=None, timeout=None, durations=None,
+                                deadline=None):
+    """Solve the routing problem using ORS optimization endpoint.
+
+    Travel times come from the local RoutingGraph if one is given, or from the
+    TravelTimeStore (fetching only missing pairs) if a store is given, and are
+    sent as a custom matrix so ORS does not have to route between the stops.
+    An already computed `durations` matrix is sent as is. `timeout` (seconds)
+    bounds each HTTP request and `deadline` (time.monotonic) bounds them all.
+    """
     jobs = []
     job_id_to_location_idx = {}
     start_time_seconds = user_prefs['start_time'] * 60
     end_time_seconds = user_prefs['end_time'] * 60
-    for idx, loc in enumerate(locations[1:], start=1):
+    coords = locations.coords.tolist()
+    services = (locations.visit_duration * 60).tolist()
+    for idx in range(1, len(locations)):
         job = {
             'id': idx,
-            'location': [loc['lng'], loc['lat']],
-            'service': loc['visit_duration'] * 60,
+            'location': coords[idx],
+            'service': services[idx],
             'time_windows': [[start_time_seconds, end_time_seconds]],
             'skills': [1]
         }
@@ -174,12 +392,30 @@ def solve_with_ors_optimization(locations, user_prefs, api_key):
         'vehicles': [vehicle]
     }
 
+    if durations is None and graph is not None:
+        durations = graph.duration_matrix(locations.coords, user_prefs['mode_of_travel'])
+    elif durations is None and store is not None:
+        durations = cached_duration_matrix(locations, user_prefs['mode_of_travel'], api_key, store,
+                                           timeout=timeout, deadline=deadline)
+
+    if durations is not None:
+        for job in jobs:
+            del job['location']
+            job['location_index'] = job['id']
+        del vehicle['start'], vehicle['end']
+        vehicle['start_index'] = vehicle['end_index'] = 0
+        request_json['matrices'] = {user_prefs['mode_of_travel']: {'durations': durations.tolist()}}
+
     url = 'https://api.openrouteservice.org/optimization'
     headers = {
         'Authorization': api_key,
         'Content-Type': 'application/json'
     }
-    response = requests.post(url, json=request_json, headers=headers)
+    try:
+        response = requests.post(url, json=request_json, headers=headers, timeout=request_timeout(timeout, deadline))
+    except requests.exceptions.RequestException as e:
+        print("ORS Optimization API request failed:", e)
+        return None, None
 
     if response.status_code == 200:
         data = response.json()
@@ -203,13 +439,9 @@ def solve_with_ors_optimization(locations, user_prefs, api_key):
                         loc_idx = job_id_to_location_idx.get(step_id, 0)
                     else:
                         loc_idx = 0
-                    steps_info.append({
-                        'type': step_type,
-                        'location_idx': loc_idx,
-                        'arrival': arrival
-                    })
+                    steps_info.append((step_type, loc_idx, arrival))
                     route.append(loc_idx)
-        return route, steps_info
+        return route, np.array(steps_info, dtype=STEP_DTYPE)
     else:
         print("ORS Optimization API error:", response.text)
         return None, None
@@ -224,54 +456,75 @@ def print_solution(locations, steps_info, user_prefs):
     result = ''
     print('\nOptimized Itinerary:')
     result += '\nOptimized Itinerary:\n'
-    for step in steps_info:
-        loc_idx = step['location_idx']
-        loc = locations[loc_idx]
-        arrival_time = seconds_to_time(step['arrival'])
-        if step['type'] == 'start':
-            print(f"{loc['name']} (Start Time: {arrival_time}) -> ", end='')
-            result += f"{loc['name']} (Start Time: {arrival_time}) -> "
-        elif step['type'] == 'job':
-            print(f"{loc['name']} (Arrival: {arrival_time}) -> ", end='')
-            result += f"{loc['name']} (Arrival: {arrival_time}) -> "
-        elif step['type'] == 'end':
-            print(f"{loc['name']} (End Time: {arrival_time})")
-            result += f"{loc['name']} (End Time: {arrival_time})"
-
-    unique_locations = set([step['location_idx'] for step in steps_info if step['type'] == 'job'])
+    for step_type, loc_idx, arrival in steps_info.tolist():
+        name = locations.names[loc_idx]
+        arrival_time = seconds_to_time(arrival)
+        if step_type == 'start':
+            print(f"{name} (Start Time: {arrival_time}) -> ", end='')
+            result += f"{name} (Start Time: {arrival_time}) -> "
+        elif step_type == 'job':
+            print(f"{name} (Arrival: {arrival_time}) -> ", end='')
+            result += f"{name} (Arrival: {arrival_time}) -> "
+        elif step_type == 'end':
+            print(f"{name} (End Time: {arrival_time})")
+            result += f"{name} (End Time: {arrival_time})"
+
+    unique_locations = np.unique(steps_info['location_idx'][steps_info['type'] == 'job'])
     print(f"Total number of locations visited: {len(unique_locations)}")
 
     result += f"\nTotal number of locations visited: {len(unique_locations)}"
     return result
 
-def plot_route_on_map(locations, steps_info, mode, api_key='YOUR_API_KEY'):
-    """Plot the optimized route on a map using Folium, including all top locations."""
+def _fetch_directions(coordinates, mode, api_key):
     client = openrouteservice.Client(key=api_key)
-    
-    coords = []
-    for step in steps_info:
-        loc_idx = step['location_idx']
-        loc = locations[loc_idx]
-        coords.append((loc['lng'], loc['lat']))
-    
-    unique_coords = [coords[0]]
-    for coord in coords[1:]:
-        if coord != unique_coords[-1]:
-            unique_coords.append(coord)
-    
+    geometry = client.directions(
+        coordinates=coordinates,
+        profile=mode,
+        format='geojson'
+    )['features'][0]['geometry']
+    return geometry['coordinates']
+
+def fetch_directions(coordinates, mode, api_key):
+    """Fetch the route geometry ([lng, lat] list) through the given coordinates from ORS."""
+    key = (mode, tuple(map(tuple, coordinates)))
+    return _directions_flight.do(key, _fetch_directions, coordinates, mode, api_key)
+
+def route_geometry(locations, steps_info, mode, api_key='YOUR_API_KEY', graph=None):
+    """Return the route polyline as a list of [lng, lat] (empty if directions fail).
+
+    Leg geometries come from the local RoutingGraph when one is given, otherwise
+    from the ORS directions API.
+    """
+    coords = locations.coords[steps_info['location_idx']]
+    changed = np.any(np.diff(coords, axis=0) != 0, axis=1)
+    unique_coords = coords[np.concatenate(([True], changed))].tolist()
+
+    if graph is not None:
+        return graph.route_geometry(unique_coords)
     try:
-        geometry = client.directions(
-            coordinates=unique_coords,
-            profile=mode,
-            format='geojson'
-        )['features'][0]['geometry']
-        decoded_geometry = geometry['coordinates']
+        return fetch_directions(unique_coords, mode, api_key)
     except Exception as e:
         print("Error fetching directions from ORS:", e)
-        decoded_geometry = []
+        return []
+
+def marker_style(step_type, loc):
+    """Return (icon color, label, show review stats) for a route marker."""
+    if step_type == 'start':
+        return 'red', 'Start', False
+    if step_type == 'end':
+        return 'red', 'End', False
+    if loc['category'].lower() == 'restaurant':
+        return 'blue', 'Restaurant', True
+    return 'green', loc['category'].capitalize(), True
+
+def plot_route_on_map(locations, steps_info, mode, api_key='YOUR_API_KEY', graph=None, save_path=None):
+    """Plot the optimized route on a map using Folium, including all top locations.
+
+    The map is only written to disk when `save_path` is given.
+    """
+    decoded_geometry = route_geometry(locations, steps_info, mode, api_key=api_key, graph=graph)
 
-    start_loc = locations[0]
-    m = folium.Map(location=[start_loc['lat'], start_loc['lng']], zoom_start=13)
+    m = folium.Map(location=[locations.lat[0], locations.lng[0]], zoom_start=13)
 
     if decoded_geometry:
         folium.PolyLine(
@@ -281,27 +534,13 @@ def plot_route_on_map(locations, steps_info, mode, api_key='YOUR_API_KEY'):
             opacity=0.8
         ).add_to(m)
 
-    for step in steps_info:
-        loc_idx = step['location_idx']
-        loc = locations[loc_idx]
-        if step['type'] == 'start':
-            icon_color = 'red'
-            popup_text = f"<b>{loc['name']}</b> (Start)"
-        elif step['type'] == 'end':
-            icon_color = 'red'
-            popup_text = f"<b>{loc['name']}</b> (End)"
-        elif loc['category'].lower() == 'restaurant':
-            icon_color = 'blue'
-            popup_text = (
-                f"<b>{loc['name']}</b> (Restaurant)<br>"
-                f"Reviews: {loc['numReviews']}<br>"
-                f"Polarity: {loc['polarity']}"
-            )
-        else:
-            icon_color = 'green'
-            popup_text = (
-                f"<b>{loc['name']}</b> ({loc['category'].capitalize()})<br>"
-                f"Reviews: {loc['numReviews']}<br>"
+    for step_type, loc_idx, _ in steps_info.tolist():
+        loc = locations.row(loc_idx)
+        icon_color, label, show_stats = marker_style(step_type, loc)
+        popup_text = f"<b>{loc['name']}</b> ({label})"
+        if show_stats:
+            popup_text += (
+                f"<br>Reviews: {loc['numReviews']}<br>"
                 f"Polarity: {loc['polarity']}"
             )
         folium.Marker(
@@ -310,8 +549,9 @@ def plot_route_on_map(locations, steps_info, mode, api_key='YOUR_API_KEY'):
             icon=folium.Icon(color=icon_color)
         ).add_to(m)
 
-    m.save('optimized_route.html')
-    print("\nMap has been saved to 'optimized_route.html'. Open this file to view the route.")
+    if save_path is not None:
+        m.save(save_path)
+        print(f"\nMap has been saved to '{save_path}'. Open this file to view the route.")
 
     return m
 
@@ -352,10 +592,11 @@ def optimal_route():
     ORS_API_KEY = 'insert_key_here'
     route, steps_info = solve_with_ors_optimization(locations, user_prefs, ORS_API_KEY)
 
-    if route and steps_info:
+    if route:
         print_solution(locations, steps_info, user_prefs)
-        plot_route_on_map(locations, steps_info, user_prefs['mode_of_travel'], api_key=ORS_API_KEY)
+        plot_route_on_map(locations, steps_info, user_prefs['mode_of_travel'], api_key=ORS_API_KEY, save_path='optimized_route.html')
     else:
         print("No solution found.")
 
-optimal_route()
+if __name__ == "__main__":
+    optimal_route()
@@ -0,0 +1,92 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+
+class CategoryIndex:
+    """Range index over (polarity, numReviews) for one category of scored places.
+
+    Rows are sorted by polarity descending and cut into fixed-size blocks, so
+    `polarity >= p` is always a prefix of blocks. Each block stores its maximum
+    numReviews (blocks that cannot meet the review threshold are skipped) and
+    its rows in descending score order, so a best-first merge over the
+    surviving blocks yields the top-k rows without scanning the whole city.
+    """
+
+    def __init__(self, frame, block_size=64, score_col='overall_score'):
+        order = np.lexsort((-frame[score_col].to_numpy(), -frame['polarity'].to_numpy()))
+        self.frame = frame.iloc[order].reset_index(drop=True)
+        self.block_size = block_size
+        self.polarity = self.frame['polarity'].to_numpy(dtype=np.float64)
+        self.reviews = self.frame['numReviews'].to_numpy(dtype=np.float64)
+        self.score = self.frame[score_col].to_numpy(dtype=np.float64)
+
+        n = len(self.frame)
+        block_starts = np.arange(0, n, block_size)
+        block_ids = np.arange(n) // block_size
+        self.block_max_reviews = np.maximum.reduceat(self.reviews, block_starts) if n else np.empty(0)
+        # Row positions grouped by block, each block's segment sorted by score (descending)
+        self.rows_by_score = np.lexsort((-self.score, block_ids))
+
+    def __len__(self):
+        return len(self.frame)
+
+    def top(self, min_polarity, min_reviews, k):
+        """Positions of the k highest-scoring rows with polarity >= min_polarity
+        and numReviews >= min_reviews, best first."""
+        if k <= 0 or len(self.frame) == 0:
+            return []
+        # polarity is sorted descending, so the qualifying rows end at `end`
+        end = int(np.searchsorted(-self.polarity, -min_polarity, side='right'))
+        n_blocks = -(-end // self.block_size)
+        blocks = np.flatnonzero(self.block_max_reviews[:n_blocks] >= min_reviews).tolist()
+
+        heap = []
+        for b in blocks:
+            first = self.rows_by_score[b * self.block_size]
+            heap.append((-self.score[first], b, 0))
+        heapq.heapify(heap)
+
+        result = []
+        while heap and len(result) < k:
+            _, b, offset = heapq.heappop(heap)
+            start = b * self.block_size
+            row = self.rows_by_score[start + offset]
+            if row < end and self.reviews[row] >= min_reviews:
+                result.append(row)
+            offset += 1
+            if offset < self.block_size and start + offset < len(self.frame):
+                nxt = self.rows_by_score[start + offset]
+                heapq.heappush(heap, (-self.score[nxt], b, offset))
+        return result
+
+
+class PlaceIndex:
+    """Per-category CategoryIndex for a scored city frame (see select_top_locations_indexed)."""
+
+    def __init__(self, df, block_size=64):
+        self.frame = df
+        categories = df['category'].str.lower()
+        self.indexes = {
+            category: CategoryIndex(df[categories == category], block_size)
+            for category in categories.unique()
+        }
+
+    @property
+    def categories(self):
+        return list(self.indexes)
+
+    def top(self, categories, min_polarity, min_reviews, k):
+        """Top k places by overall_score across `categories` that meet both thresholds."""
+        parts = []
+        for category in categories:
+            index = self.indexes.get(category.lower())
+            if index is None:
+                continue
+            rows = index.top(min_polarity, min_reviews, k)
+            if rows:
+                parts.append(index.frame.iloc[rows])
+        if not parts:
+            return self.frame.iloc[:0]
+        return pd.concat(parts).sort_values(by='overall_score', ascending=False).head(k)
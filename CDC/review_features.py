@@ -0,0 +1,162 @@
+import asyncio
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+FEATURE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def trip_month(trip_date):
+    """Month number (1-12) of a trip date, or None when no date is set."""
+    if not trip_date:
+        return None
+    return pd.Timestamp(trip_date).month
+
+
+def build_review_features(reviews_by_place):
+    """Compute review features for many places at once.
+
+    `reviews_by_place` maps place id -> list of tour-pedia review dicts. All
+    timestamps are parsed in one vectorised call. Returns a DataFrame with
+    `id`, `review_count`, `last_review` and fixed-width int32 histograms
+    `monthly_reviews` (12 bins, Jan..Dec) and `weekday_reviews` (7 bins, Mon..Sun).
+    """
+    ids = list(reviews_by_place)
+    place_idx = []
+    times = []
+    for i, place_id in enumerate(ids):
+        for review in reviews_by_place[place_id] or []:
+            if isinstance(review, dict) and review.get('time'):
+                place_idx.append(i)
+                times.append(review['time'])
+
+    parsed = pd.to_datetime(pd.Series(times, dtype=object), errors='coerce', utc=True, format='ISO8601')
+    valid = parsed.notna().to_numpy()
+    place_idx = np.asarray(place_idx, dtype=np.int64)[valid]
+    parsed = parsed[valid]
+    n = len(ids)
+
+    months = parsed.dt.month.to_numpy() - 1
+    weekdays = parsed.dt.weekday.to_numpy()
+    monthly = np.bincount(place_idx * 12 + months, minlength=n * 12).reshape(n, 12).astype(np.int32)
+    weekday = np.bincount(place_idx * 7 + weekdays, minlength=n * 7).reshape(n, 7).astype(np.int32)
+
+    last_review = parsed.groupby(place_idx).max().reindex(range(n))
+    return pd.DataFrame({
+        'id': ids,
+        'review_count': monthly.sum(axis=1),
+        'last_review': last_review.to_numpy(),
+        'monthly_reviews': list(monthly),
+        'weekday_reviews': list(weekday)
+    })
+
+
+def save_review_features(features, path):
+    """Write features to Parquet with the histograms as fixed-size int32 list columns."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.table({
+        'id': pa.array(features['id'].astype(str)),
+        'review_count': pa.array(features['review_count'].to_numpy(dtype=np.int32)),
+        'last_review': pa.array(pd.to_datetime(features['last_review'], utc=True)),
+        'monthly_reviews': pa.FixedSizeListArray.from_arrays(
+            pa.array(np.concatenate(features['monthly_reviews'].to_list() or [np.empty(0, np.int32)]), pa.int32()), 12),
+        'weekday_reviews': pa.FixedSizeListArray.from_arrays(
+            pa.array(np.concatenate(features['weekday_reviews'].to_list() or [np.empty(0, np.int32)]), pa.int32()), 7)
+    })
+    pq.write_table(table, path)
+
+
+class ReviewFeatures:
+    """Review features for one city loaded as dense arrays, row-aligned with `ids`."""
+
+    def __init__(self, ids, review_count, last_review, monthly, weekday):
+        self.ids = ids
+        self.review_count = review_count
+        self.last_review = last_review
+        self.monthly = monthly
+        self.weekday = weekday
+
+    @classmethod
+    def load(cls, path):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+
+        def histogram(name, width):
+            column = table.column(name).combine_chunks()
+            return column.flatten().to_numpy().reshape(-1, width).astype(np.int32, copy=False)
+
+        return cls(
+            pd.Index(table.column('id').to_pylist()),
+            table.column('review_count').to_numpy(),
+            table.column('last_review').to_pandas(),
+            histogram('monthly_reviews', 12),
+            histogram('weekday_reviews', 7)
+        )
+
+    def seasonality(self, trip_date, prior=2.0):
+        """Reviews in the trip month relative to the place's average month (1.0 = typical).
+
+        `prior` pseudo-reviews are added to every month, which shrinks places
+        with few reviews toward 1.0: a single review in the trip month scores
+        about 1.4 instead of 12. Places without reviews get exactly 1.0.
+        """
+        month = trip_month(trip_date) - 1
+        mean = self.monthly.mean(axis=1)
+        ratio = (self.monthly[:, month] + prior) / (mean + prior)
+        return pd.Series(ratio, index=self.ids)
+
+    def days_since_last_review(self, as_of):
+        as_of = pd.Timestamp(as_of, tz='UTC') if pd.Timestamp(as_of).tzinfo is None else pd.Timestamp(as_of)
+        return pd.Series((as_of - self.last_review).dt.days.to_numpy(), index=self.ids)
+
+
+def feature_path(city, feature_dir=FEATURE_DIR):
+    return os.path.join(feature_dir, f'review_features_{city.lower()}.parquet')
+
+
+@lru_cache(maxsize=16)
+def load_review_features(city, feature_dir=FEATURE_DIR):
+    """ReviewFeatures for a city, or None if no feature file has been built."""
+    path = feature_path(city, feature_dir)
+    if not os.path.exists(path):
+        return None
+    return ReviewFeatures.load(path)
+
+
+async def fetch_reviews(session, place_id):
+    url = f"http://tour-pedia.org/api/getReviewsByPlaceId?placeId={place_id}"
+    try:
+        async with session.get(url) as response:
+            return await response.json()
+    except Exception as e:
+        print(f"Error fetching reviews for place {place_id}: {e}")
+        return []
+
+
+async def crawl_city_features(city, concurrency=16):
+    """Fetch reviews for every place in combined_places_<city>.csv and save its feature file."""
+    import aiohttp
+
+    places = pd.read_csv(os.path.join(FEATURE_DIR, f'combined_places_{city.lower()}.csv'), usecols=['id'])
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession() as session:
+        async def fetch(place_id):
+            async with semaphore:
+                return place_id, await fetch_reviews(session, place_id)
+
+        results = await asyncio.gather(*(fetch(place_id) for place_id in places['id'].tolist()))
+
+    features = build_review_features(dict(results))
+    save_review_features(features, feature_path(city))
+    print(f"Saved review features for {len(features)} places in {city}")
+
+
+if __name__ == "__main__":
+    for city in ['Amsterdam', 'Tuscany', 'Barcelona', 'Berlin', 'Dubai', 'London', 'Paris', 'Rome']:
+        asyncio.run(crawl_city_features(city))
@@ -0,0 +1,126 @@
+import json
+
+import numpy as np
+
+from optimal_route import route_geometry, marker_style
+
+# Leaflet page shared by every itinerary; only the payload JSON changes per request
+ROUTE_MAP_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>html, body, #map { height: 100%; margin: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+var payload = __PAYLOAD__;
+
+function decodePolyline(str) {
+    var points = [], index = 0, lat = 0, lng = 0;
+    while (index < str.length) {
+        var values = [0, 0];
+        for (var k = 0; k < 2; k++) {
+            var shift = 0, result = 0, b;
+            do {
+                b = str.charCodeAt(index++) - 63;
+                result |= (b & 0x1f) << shift;
+                shift += 5;
+            } while (b >= 0x20);
+            values[k] = (result & 1) ? ~(result >> 1) : (result >> 1);
+        }
+        lat += values[0];
+        lng += values[1];
+        points.push([lat / 1e5, lng / 1e5]);
+    }
+    return points;
+}
+
+function escapeHtml(text) {
+    var div = document.createElement('div');
+    div.textContent = String(text);
+    return div.innerHTML;
+}
+
+var map = L.map('map').setView(payload.center, 13);
+L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+    attribution: '&copy; OpenStreetMap contributors'
+}).addTo(map);
+
+if (payload.polyline) {
+    L.polyline(decodePolyline(payload.polyline), {color: 'blue', weight: 5, opacity: 0.8}).addTo(map);
+}
+
+payload.markers.forEach(function (marker) {
+    var row = payload.popups[marker[3]];
+    var html = '<b>' + escapeHtml(row[0]) + '</b> (' + escapeHtml(row[1]) + ')';
+    if (row[2] !== null) {
+        html += '<br>Reviews: ' + row[2] + '<br>Polarity: ' + row[3];
+    }
+    L.circleMarker([marker[0], marker[1]], {radius: 8, color: marker[2], fillOpacity: 0.8})
+        .bindPopup(html, {maxWidth: 300})
+        .addTo(map);
+});
+</script>
+</body>
+</html>
+"""
+
+
+def encode_polyline(coords, precision=5):
+    """Encode a list of [lng, lat] points with the Google polyline algorithm."""
+    if len(coords) == 0:
+        return ''
+    points = np.rint(np.asarray(coords, dtype=np.float64)[:, ::-1] * 10 ** precision).astype(np.int64)
+    deltas = np.diff(points, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1).tolist()
+
+    chars = []
+    for value in values:
+        while value >= 0x20:
+            chars.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chars.append(chr(value + 63))
+    return ''.join(chars)
+
+
+def build_route_payload(locations, steps_info, mode, api_key='YOUR_API_KEY', graph=None):
+    """Build a compact, JSON-serialisable description of an itinerary map.
+
+    markers are [lat, lng, color, popup index]; popups are
+    [name, label, numReviews, polarity] with null stats for start/end.
+    """
+    geometry = route_geometry(locations, steps_info, mode, api_key=api_key, graph=graph)
+
+    markers = []
+    popups = []
+    popup_index = {}
+    for step_type, loc_idx, _ in steps_info.tolist():
+        loc = locations.row(loc_idx)
+        icon_color, label, show_stats = marker_style(step_type, loc)
+        key = (loc_idx, label)
+        if key not in popup_index:
+            popup_index[key] = len(popups)
+            popups.append([
+                str(loc['name']),
+                label,
+                loc['numReviews'] if show_stats else None,
+                loc['polarity'] if show_stats else None
+            ])
+        markers.append([round(loc['lat'], 6), round(loc['lng'], 6), icon_color, popup_index[key]])
+
+    return {
+        'center': [round(float(locations.lat[0]), 6), round(float(locations.lng[0]), 6)],
+        'polyline': encode_polyline(geometry),
+        'markers': markers,
+        'popups': popups
+    }
+
+
+def render_route_payload(payload):
+    """Render a payload from `build_route_payload` into the shared Leaflet page."""
+    # Escape '</' so names can never close the script tag
+    payload_json = json.dumps(payload, separators=(',', ':')).replace('</', '<\\/')
+    return ROUTE_MAP_TEMPLATE.replace('__PAYLOAD__', payload_json)
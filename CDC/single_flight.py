@@ -0,0 +1,75 @@
+import asyncio
+import functools
+import inspect
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key.
+
+    The first caller for a key (the leader) runs the function; every caller that
+    arrives while it is still running waits for and receives the same result or
+    exception. Once the call finishes the key is forgotten, so later calls fetch
+    fresh data. Works from threads (`do`) and from asyncio tasks (`do_async`);
+    async followers await the shared future without blocking the event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def _join(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Call `fn(*args, **kwargs)` unless a call for `key` is already in flight."""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+
+        # BaseException too, so an interrupted leader never leaves the key stuck in flight
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """Async variant of `do`.
+
+        Coroutine functions are awaited on the loop; plain functions run in the
+        loop's default executor so they never block it.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            if inspect.iscoroutinefunction(fn):
+                result = await fn(*args, **kwargs)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+        except BaseException as e:
+            # Covers CancelledError, so followers are released when the leader is cancelled
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# CDC modules import each other by bare name, as when run from the CDC folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
@@ -0,0 +1,131 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import anytime_solver
+from anytime_solver import solve_anytime
+from optimal_route import prepare_locations
+
+
+def make_prefs(**overrides):
+    user_prefs = {
+        'start_lat': 41.9, 'start_lng': 12.5, 'start_time': 600, 'end_time': 900,
+        'mode_of_travel': 'foot-walking', 'time_budget': 1
+    }
+    user_prefs.update(overrides)
+    return user_prefs
+
+
+@pytest.fixture
+def locations():
+    places = pd.DataFrame({
+        'id': [1, 2, 3],
+        'name': ['a', 'b', 'c'],
+        'lat': [41.901, 41.902, 41.903],
+        'lng': [12.501, 12.502, 12.503],
+        'category': 'poi',
+        'numReviews': 10,
+        'polarity': 5.0
+    })
+    return prepare_locations(places, make_prefs())
+
+
+@pytest.fixture(autouse=True)
+def no_remote(monkeypatch):
+    monkeypatch.setattr(anytime_solver, 'solve_with_ors_optimization', lambda *args, **kwargs: (None, None))
+
+
+def test_local_fallback(locations):
+    route, steps_info, report = solve_anytime(locations, make_prefs(), 'key')
+    assert report['backend'] == 'local'
+    assert route[0] == route[-1] == 0
+    assert sorted(route[1:-1]) == [1, 2, 3]
+    assert report['visited'] == 3
+    assert steps_info['arrival'][0] == 600 * 60
+
+
+def test_empty_window_returns_no_route(locations):
+    updates = []
+    route, steps_info, report = solve_anytime(locations, make_prefs(start_time=600, end_time=500), 'key',
+                                              on_update=lambda *args: updates.append(args))
+    assert route is None and steps_info is None
+    assert report['visited'] == 0
+    assert updates == []
+
+
+def test_local_matrix_uses_known_store_pairs(locations, tmp_path):
+    from travel_time_store import TravelTimeStore
+
+    store = TravelTimeStore('foot-walking', str(tmp_path), capacity=4)
+    store.update(['1', '2'], [0], [1], [[1234.0]])
+    durations = anytime_solver.local_duration_matrix(locations, 'foot-walking', store=store)
+    estimate = anytime_solver.straight_line_duration_matrix(locations.coords, 'foot-walking')
+
+    assert durations[1, 2] == 1234
+    assert durations[2, 1] == estimate[2, 1]
+    assert durations[0, 1] == estimate[0, 1]
+
+
+def test_graph_matrix_is_computed_once_within_the_budget(locations, monkeypatch):
+    calls = []
+
+    class SlowGraph:
+        def duration_matrix(self, coords, profile):
+            calls.append(profile)
+            time.sleep(3)
+            return anytime_solver.straight_line_duration_matrix(coords, profile)
+
+    started = time.monotonic()
+    route, _, report = solve_anytime(locations, make_prefs(time_budget=0.5), 'key', graph=SlowGraph())
+    assert time.monotonic() - started < 1.5
+    assert report['backend'] == 'local' and route is not None
+    assert calls == ['foot-walking']
+
+
+
+def test_remote_solve_stops_at_the_deadline(locations, monkeypatch):
+    import optimal_route
+
+    timeouts = []
+
+    def slow_post(url, json=None, headers=None, timeout=None):
+        timeouts.append(timeout)
+        time.sleep(timeout)
+        raise optimal_route.requests.exceptions.Timeout()
+
+    monkeypatch.setattr(anytime_solver, 'solve_with_ors_optimization', optimal_route.solve_with_ors_optimization)
+    monkeypatch.setattr(optimal_route.requests, 'post', slow_post)
+    executor = ThreadPoolExecutor(max_workers=1)
+    started = time.monotonic()
+    _, _, report = solve_anytime(locations, make_prefs(time_budget=0.5), 'key', executor=executor)
+    executor.shutdown(wait=True)
+
+    assert report['backend'] == 'local'
+    assert timeouts and all(timeout <= 0.5 for timeout in timeouts)
+    # The background solve gave up at the caller's deadline instead of holding the worker
+    assert time.monotonic() - started < 1.2
+
+
+def test_queued_remote_solve_is_cancelled(locations, monkeypatch):
+    calls = []
+    monkeypatch.setattr(anytime_solver, 'solve_with_ors_optimization',
+                        lambda *args, **kwargs: calls.append(1) or (None, None))
+    executor = ThreadPoolExecutor(max_workers=1)
+    executor.submit(time.sleep, 0.5)
+    _, _, report = solve_anytime(locations, make_prefs(time_budget=0.2), 'key', executor=executor)
+    executor.shutdown(wait=True)
+
+    assert report['backend'] == 'local'
+    assert calls == []
+
+
+def test_on_update_gets_the_greedy_route_first(locations):
+    updates = []
+    route, _, _ = solve_anytime(locations, make_prefs(), 'key',
+                                on_update=lambda route, steps_info: updates.append((route, steps_info)))
+    assert len(updates) == 1
+    greedy_route, greedy_steps = updates[0]
+    assert greedy_route[0] == greedy_route[-1] == 0
+    assert greedy_steps['type'][0] == 'start'
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from chunked_places import iter_record_chunks, process_places, sort_places
+
+
+def test_sort_places_keeps_columns_from_later_chunks(tmp_path):
+    chunks = [
+        pd.DataFrame({'id': [1, 2], 'polarity': [5, 9], 'numReviews': [10, 20]}),
+        pd.DataFrame({'id': [3], 'polarity': [7], 'numReviews': [5], 'address': ['Via Roma']})
+    ]
+    out = tmp_path / 'sorted.csv'
+    assert sort_places(chunks, str(out), run_rows=1, chunksize=1) == 3
+
+    df = pd.read_csv(out)
+    assert list(df['id']) == [2, 3, 1]
+    assert list(df.columns) == ['id', 'polarity', 'numReviews', 'address']
+    assert df.loc[df['id'] == 3, 'address'].item() == 'Via Roma'
+    assert df['address'].isna().sum() == 2
+
+
+def test_process_places_scores_and_keeps_top_n(tmp_path):
+    records = [
+        {'id': i, 'category': 'poi' if i % 2 else 'restaurant', 'polarity': i % 10, 'numReviews': i}
+        for i in range(1, 101)
+    ]
+    out = tmp_path / 'top.csv'
+    rows = process_places(lambda: iter_record_chunks(records, chunksize=7), str(out),
+                          min_reviews=10, max_reviews=90, top_n=3, run_rows=4, chunksize=2)
+    df = pd.read_csv(out)
+    assert rows == len(df) == 6
+
+    full = pd.DataFrame(records)
+    full = full[(full['numReviews'] >= 10) & (full['numReviews'] <= 90)]
+    full['overall_score'] = (0.7 * full['polarity'] / 9
+                             + 1.5 * (full['numReviews'] - 10) / 80)
+    for category, group in df.groupby('category'):
+        expected = full[full['category'] == category].nlargest(3, 'overall_score')['id']
+        assert set(group['id']) == set(expected)
@@ -0,0 +1,77 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from itinerary_cache import METRES_PER_DEGREE, ItineraryCache, itinerary_signature
+from optimal_route import STEP_DTYPE, prepare_locations
+
+
+def make_prefs(**overrides):
+    user_prefs = {
+        'city': 'Rome', 'categories': ['poi', 'restaurant'], 'mode_of_travel': 'foot-walking',
+        'start_lat': 41.9, 'start_lng': 12.5, 'start_time': 480, 'end_time': 1000,
+        'min_polarity': 4.0, 'min_num_reviews': 6, 'underground': False, 'remove_tourist': False,
+        'trip_date': None
+    }
+    user_prefs.update(overrides)
+    return user_prefs
+
+
+def make_result(user_prefs, end_arrival_minutes=700, backend='ors'):
+    places = pd.DataFrame({'id': [1], 'name': ['Colosseum'], 'lat': [41.89], 'lng': [12.49],
+                           'category': ['attraction'], 'numReviews': [100], 'polarity': [8.0]})
+    start_s = user_prefs['start_time'] * 60
+    steps_info = np.array([('start', 0, start_s), ('job', 1, start_s + 600),
+                           ('end', 0, end_arrival_minutes * 60)], dtype=STEP_DTYPE)
+    return {
+        'route': 'text', 'payload': None, 'steps_info': steps_info,
+        'locations': prepare_locations(places, user_prefs),
+        'start_time': user_prefs['start_time'], 'solver': {'backend': backend}
+    }
+
+
+def test_nearby_start_points_share_a_cell():
+    base = itinerary_signature(make_prefs())
+    assert itinerary_signature(make_prefs(start_lat=41.9 + 10 / METRES_PER_DEGREE)) == base
+
+
+def test_grid_cell_boundary():
+    # Latitude of the boundary between two 200 m cells just north of 41.9
+    boundary = (math.floor(41.9 * METRES_PER_DEGREE / 200) + 1) * 200 / METRES_PER_DEGREE
+    below = itinerary_signature(make_prefs(start_lat=boundary - 1e-7))
+    above = itinerary_signature(make_prefs(start_lat=boundary + 1e-7))
+    assert below != above
+
+
+@pytest.mark.parametrize('start_time, same', [(487, True), (473, True), (488, False), (472, False)])
+def test_time_rounding(start_time, same):
+    base = itinerary_signature(make_prefs(start_time=480))
+    assert (itinerary_signature(make_prefs(start_time=start_time)) == base) is same
+
+
+def test_hit_is_retimed():
+    cache = ItineraryCache()
+    cache.put(make_prefs(), 25, make_result(make_prefs()))
+
+    result = cache.get(make_prefs(start_time=487), 25)
+    assert result['start_time'] == 487
+    assert result['steps_info']['arrival'].tolist() == [487 * 60, 487 * 60 + 600, 707 * 60]
+    assert 'Start Time: 08:07' in result['route']
+    # The stored entry is left untouched
+    assert cache.get(make_prefs(), 25)['steps_info']['arrival'][0] == 480 * 60
+
+
+def test_retime_past_end_time_is_a_miss():
+    cache = ItineraryCache()
+    cache.put(make_prefs(), 25, make_result(make_prefs(), end_arrival_minutes=995))
+    assert cache.get(make_prefs(start_time=484), 25) is not None
+    assert cache.get(make_prefs(start_time=487), 25) is None
+
+
+def test_local_backend_results_are_not_stored():
+    cache = ItineraryCache()
+    cache.put(make_prefs(), 25, make_result(make_prefs(), backend='local'))
+    cache.put(make_prefs(), 25, None)
+    assert cache.get(make_prefs(), 25) is None
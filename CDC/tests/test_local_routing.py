@@ -0,0 +1,106 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from conftest import DATA_DIR
+from local_routing import (
+    PROFILE_SPEEDS,
+    UNREACHABLE_SECONDS,
+    RoutingGraph,
+    haversine_m,
+    way_allowed,
+    way_direction
+)
+
+
+@pytest.fixture(scope='module')
+def grid():
+    # 3x3 two-way grid with ~0.001 degree spacing; node 9 is an isolated node
+    return RoutingGraph.load(os.path.join(DATA_DIR, 'grid_3x3.npz'))
+
+
+def test_duration_matrix(grid):
+    corner, opposite, isolated = grid.node_coords[[0, 8, 9]]
+    durations = grid.duration_matrix([corner, opposite, isolated], 'foot-walking')
+
+    # Corner to corner is two steps east and two steps north along the grid
+    east = haversine_m(corner[0], corner[1], corner[0] + 0.001, corner[1])
+    north = haversine_m(corner[0], corner[1], corner[0], corner[1] + 0.001)
+    expected = round(2 * (east + north) / PROFILE_SPEEDS['foot-walking'])
+
+    assert durations.dtype == np.int64
+    assert np.all(np.diag(durations) == 0)
+    assert abs(durations[0, 1] - expected) <= 1
+    assert durations[0, 1] == durations[1, 0]
+    assert durations[0, 2] == UNREACHABLE_SECONDS
+    assert durations[2, 0] == UNREACHABLE_SECONDS
+
+
+def test_duration_matrix_scales_with_profile(grid):
+    coords = grid.node_coords[[0, 8]]
+    walking = grid.duration_matrix(coords, 'foot-walking')[0, 1]
+    driving = grid.duration_matrix(coords, 'driving-car')[0, 1]
+    assert walking > driving > 0
+
+
+def test_route_geometry(grid):
+    start, end = grid.node_coords[0].tolist(), grid.node_coords[2].tolist()
+    geometry = grid.route_geometry([start, end])
+
+    assert geometry[0] == start
+    assert geometry[-1] == end
+    # The path runs along the bottom row through the middle node
+    assert grid.node_coords[1].tolist() in geometry
+
+
+def test_route_geometry_unreachable_leg_is_straight(grid):
+    start, isolated = grid.node_coords[0].tolist(), grid.node_coords[9].tolist()
+    assert grid.route_geometry([start, isolated]) == [start, isolated]
+
+
+def test_way_filters_per_profile():
+    assert way_allowed({'highway': 'motorway'}, 'driving-car')
+    assert not way_allowed({'highway': 'motorway'}, 'foot-walking')
+    assert not way_allowed({'highway': 'footway'}, 'driving-car')
+    assert way_allowed({'highway': 'footway', 'bicycle': 'yes'}, 'cycling-regular')
+    assert not way_allowed({'highway': 'residential', 'access': 'private'}, 'driving-car')
+    assert not way_allowed({'building': 'yes'}, 'foot-walking')
+
+
+def test_way_direction():
+    assert way_direction({'oneway': 'yes'}, 'driving-car') == 1
+    assert way_direction({'oneway': '-1'}, 'driving-car') == -1
+    assert way_direction({'oneway': '-1'}, 'foot-walking') == 0
+    assert way_direction({'oneway': 'yes', 'oneway:bicycle': 'no'}, 'cycling-regular') == 0
+    assert way_direction({'junction': 'roundabout'}, 'driving-car') == 1
+    assert way_direction({}, 'driving-car') == 0
+
+
+def test_matrix_on_city_sized_graph_is_fast():
+    # 450 x 450 two-way grid (202,500 nodes, ~810k edges), roughly a large city
+    side = 450
+    rows, cols = np.divmod(np.arange(side * side), side)
+    coords = np.column_stack((12.4 + cols * 1e-4, 41.8 + rows * 1e-4))
+    ids = np.arange(side * side).reshape(side, side)
+    east = np.column_stack((ids[:, :-1].ravel(), ids[:, 1:].ravel()))
+    north = np.column_stack((ids[:-1].ravel(), ids[1:].ravel()))
+    edges = np.vstack((east, north))
+    graph = RoutingGraph.from_edges(coords, np.concatenate((edges[:, 0], edges[:, 1])),
+                                    np.concatenate((edges[:, 1], edges[:, 0])))
+
+    points = coords[np.random.default_rng(0).choice(len(coords), 26, replace=False)]
+    started = time.monotonic()
+    durations = graph.duration_matrix(points, 'foot-walking')
+    matrix_seconds = time.monotonic() - started
+    started = time.monotonic()
+    geometry = graph.route_geometry(points)
+    geometry_seconds = time.monotonic() - started
+
+    assert durations.shape == (26, 26)
+    assert (durations[~np.eye(26, dtype=bool)] > 0).all()
+    assert geometry[-1] == points[-1].tolist()
+    # About 1 s each here; the per-source Python Dijkstra took ~14 s for the matrix
+    assert matrix_seconds < 4.0
+    assert geometry_seconds < 4.0
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from optimal_route import select_top_locations, select_top_locations_indexed
+from place_index import CategoryIndex, PlaceIndex
+
+
+def random_places(rng, n, categories=('poi', 'restaurant', 'attraction')):
+    return pd.DataFrame({
+        'id': np.arange(n),
+        'category': rng.choice(categories, n),
+        'polarity': rng.integers(0, 10, n).astype(float),
+        'numReviews': rng.integers(0, 200, n),
+        'overall_score': rng.random(n)
+    })
+
+
+def scan_top(frame, min_polarity, min_reviews, k):
+    matches = frame[(frame['polarity'] >= min_polarity) & (frame['numReviews'] >= min_reviews)]
+    return matches.sort_values('overall_score', ascending=False).head(k)['id'].tolist()
+
+
+# Sizes around the block size cover single, exact and partial last blocks
+@pytest.mark.parametrize('n', [0, 1, 7, 8, 9, 61, 300])
+def test_category_index_matches_scan(n):
+    rng = np.random.default_rng(n)
+    frame = random_places(rng, n, categories=('poi',))
+    index = CategoryIndex(frame, block_size=8)
+    for _ in range(100):
+        min_polarity = rng.integers(0, 11)
+        min_reviews = rng.integers(0, 220)
+        k = rng.integers(0, 30)
+        rows = index.top(min_polarity, min_reviews, k)
+        assert index.frame['id'].iloc[rows].tolist() == scan_top(frame, min_polarity, min_reviews, k)
+
+
+def test_empty_category_index():
+    index = CategoryIndex(random_places(np.random.default_rng(0), 0), block_size=8)
+    assert len(index) == 0
+    assert index.top(0, 0, 5) == []
+
+
+@pytest.mark.parametrize('categories', [
+    ['poi', 'restaurant', 'attraction'],
+    ['poi', 'attraction'],
+    ['restaurant', 'museum']
+])
+def test_indexed_selection_matches_scan(categories):
+    rng = np.random.default_rng(len(categories))
+    df = random_places(rng, 250, categories=tuple(cat for cat in categories if cat != 'museum'))
+    index = PlaceIndex(df, block_size=16)
+    for _ in range(100):
+        user_prefs = {
+            'categories': categories,
+            'min_polarity': float(rng.integers(0, 10)),
+            'min_num_reviews': int(rng.integers(0, 200)),
+            'min_restaurants': int(rng.integers(0, 4)),
+            'max_restaurants': int(rng.integers(2, 5))
+        }
+        # N at least max_restaurants, as in the app (N=25, at most 2 restaurants)
+        N = int(rng.integers(user_prefs['max_restaurants'], 40))
+        expected = select_top_locations(df, user_prefs, N=N)
+        actual = select_top_locations_indexed(index, user_prefs, N=N)
+        assert sorted(actual['id']) == sorted(expected['id'])
+
+
+def test_place_index_unknown_category():
+    index = PlaceIndex(random_places(np.random.default_rng(1), 40))
+    assert index.top(['museum'], 0, 0, 10).empty
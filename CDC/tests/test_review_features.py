@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from review_features import ReviewFeatures, build_review_features, save_review_features
+
+
+def roundtrip(features, tmp_path):
+    path = tmp_path / 'features.parquet'
+    save_review_features(features, str(path))
+    return ReviewFeatures.load(str(path))
+
+
+def test_build_histograms():
+    features = build_review_features({
+        'a': [{'time': '2014-07-06T10:00:00+0000'}, {'time': '2014-07-13T10:00:00+0000'},
+              {'time': '2015-01-05T10:00:00+0000'}],
+        'b': [{'time': '2013-03-01T12:00:00Z'}]
+    })
+    a, b = features.to_dict(orient='records')
+    assert a['review_count'] == 3
+    assert a['monthly_reviews'][6] == 2 and a['monthly_reviews'][0] == 1
+    assert a['weekday_reviews'][6] == 2 and a['weekday_reviews'][0] == 1
+    assert a['last_review'] == pd.Timestamp('2015-01-05T10:00:00', tz='UTC')
+    assert b['review_count'] == 1 and b['monthly_reviews'][2] == 1
+
+
+def test_empty_input(tmp_path):
+    features = build_review_features({})
+    assert len(features) == 0
+    loaded = roundtrip(features, tmp_path)
+    assert len(loaded.ids) == 0
+    assert loaded.monthly.shape == (0, 12)
+    assert loaded.seasonality('2024-07-01').empty
+
+
+def test_bad_times_and_missing_reviews(tmp_path):
+    features = build_review_features({
+        'a': [{'time': 'not a date'}, {'time': None}, 'junk', {'text': 'no time'},
+              {'time': '2014-07-06T10:00:00+0000'}],
+        'b': None,
+        'c': []
+    })
+    assert features['review_count'].tolist() == [1, 0, 0]
+    assert pd.isna(features['last_review'].iloc[1])
+
+    loaded = roundtrip(features, tmp_path)
+    assert list(loaded.ids) == ['a', 'b', 'c']
+    assert loaded.review_count.tolist() == [1, 0, 0]
+    assert loaded.monthly[0, 6] == 1
+    assert np.array_equal(loaded.weekday.sum(axis=1), [1, 0, 0])
+    assert pd.isna(loaded.last_review.iloc[2])
+
+
+def test_seasonality_shrinks_small_samples():
+    monthly = np.zeros((3, 12), dtype=np.int32)
+    monthly[0, 6] = 1                 # one review, in the trip month
+    monthly[1] = 10
+    monthly[1, 6] = 40                # established place busy in July
+    features = ReviewFeatures(pd.Index(['single', 'busy', 'none']), monthly.sum(axis=1),
+                              pd.Series([pd.NaT] * 3), monthly, np.zeros((3, 7), dtype=np.int32))
+
+    seasonality = features.seasonality('2024-07-15')
+    assert seasonality['none'] == 1.0
+    assert 1.0 < seasonality['single'] < 2.0
+    assert seasonality['busy'] > seasonality['single']
@@ -0,0 +1,82 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from conftest import DATA_DIR
+from local_routing import RoutingGraph
+from optimal_route import STEP_DTYPE, prepare_locations
+from route_payload import build_route_payload, encode_polyline, render_route_payload
+
+
+def decode_polyline(text, precision=5):
+    """Reference decoder (same algorithm as the template's decodePolyline), returns [lng, lat]."""
+    values, value, shift = [], 0, 0
+    for char in text:
+        b = ord(char) - 63
+        value |= (b & 0x1f) << shift
+        shift += 5
+        if b < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+    points = np.cumsum(np.array(values).reshape(-1, 2), axis=0) / 10 ** precision
+    return points[:, ::-1].tolist()
+
+
+def test_encode_polyline_reference_vector():
+    # Example from Google's polyline algorithm documentation
+    coords = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+    assert encode_polyline(coords) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+    assert encode_polyline([]) == ''
+
+
+def test_encode_polyline_roundtrip():
+    coords = np.random.default_rng(0).uniform([-180, -85], [180, 85], size=(50, 2)).round(5).tolist()
+    assert np.allclose(decode_polyline(encode_polyline(coords)), coords)
+
+
+def make_itinerary(name):
+    graph = RoutingGraph.load(os.path.join(DATA_DIR, 'grid_3x3.npz'))
+    places = pd.DataFrame({
+        'id': [1, 2], 'name': [name, 'Trattoria'], 'category': ['attraction', 'restaurant'],
+        'lng': graph.node_coords[[2, 8], 0], 'lat': graph.node_coords[[2, 8], 1],
+        'numReviews': [120, 40], 'polarity': [8.0, 7.5]
+    })
+    user_prefs = {'start_lng': graph.node_coords[0, 0], 'start_lat': graph.node_coords[0, 1]}
+    locations = prepare_locations(places, user_prefs)
+    steps_info = np.array([('start', 0, 28800), ('job', 1, 29400), ('job', 2, 33000), ('end', 0, 36000)],
+                          dtype=STEP_DTYPE)
+    return locations, steps_info, graph
+
+
+def test_build_route_payload():
+    locations, steps_info, graph = make_itinerary('Colosseum')
+    payload = build_route_payload(locations, steps_info, 'foot-walking', graph=graph)
+
+    assert payload['center'] == [round(float(locations.lat[0]), 6), round(float(locations.lng[0]), 6)]
+    assert [marker[2] for marker in payload['markers']] == ['red', 'green', 'blue', 'red']
+    assert payload['popups'] == [
+        ['Start Location', 'Start', None, None],
+        ['Colosseum', 'Attraction', 120, 8.0],
+        ['Trattoria', 'Restaurant', 40, 7.5],
+        ['Start Location', 'End', None, None]
+    ]
+    path = decode_polyline(payload['polyline'])
+    assert np.allclose(path[0], locations.coords[0], atol=1e-5)
+    # The first leg follows the grid through node 1 rather than a straight line
+    assert any(np.allclose(graph.node_coords[1], point, atol=1e-5) for point in path)
+    # The payload is plain JSON
+    assert json.loads(json.dumps(payload)) == payload
+
+
+def test_render_cannot_break_out_of_the_script_tag():
+    name = 'Bar</script><script>alert(1)</script>'
+    locations, steps_info, graph = make_itinerary(name)
+    html = render_route_payload(build_route_payload(locations, steps_info, 'foot-walking', graph=graph))
+
+    assert html.count('</script>') == 2  # leaflet.js and the page script, nothing from the payload
+    script = html[html.index('var payload = '):]
+    payload_json = script[len('var payload = '):script.index(';\n')]
+    assert '</' not in payload_json
+    assert json.loads(payload_json)['popups'][1][0] == name
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_do_releases_key_after_base_exception():
+    flight = SingleFlight()
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        flight.do('key', interrupted)
+    assert flight.do('key', lambda: 42) == 42
+
+
+def test_do_async_cancelled_leader_releases_followers():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def main():
+        leader = asyncio.create_task(flight.do_async('key', slow))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do_async('key', slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+        results = await asyncio.gather(leader, follower, return_exceptions=True)
+        assert all(isinstance(r, asyncio.CancelledError) for r in results)
+        assert await flight.do_async('key', asyncio.sleep, 0, 'fresh') == 'fresh'
+
+    asyncio.run(main())
+
+
+def test_do_async_runs_plain_functions_off_the_loop():
+    flight = SingleFlight()
+
+    async def main():
+        return await flight.do_async('key', threading.get_ident)
+
+    assert asyncio.run(main()) != threading.get_ident()
@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+import optimal_route
+from optimal_route import cached_duration_matrix, prepare_locations
+from travel_time_store import TravelTimeStore
+
+
+def make_locations(start, place_ids):
+    places = pd.DataFrame({
+        'id': place_ids,
+        'name': [str(place_id) for place_id in place_ids],
+        'lat': [41.9 + place_id * 1e-3 for place_id in place_ids],
+        'lng': [12.5 + place_id * 1e-3 for place_id in place_ids],
+        'category': 'poi',
+        'numReviews': 10,
+        'polarity': 5.0
+    })
+    return prepare_locations(places, {'start_lng': start[0], 'start_lat': start[1]})
+
+
+def fake_matrix(calls):
+    def fetch(coords, profile, api_key, sources, destinations, timeout=None, deadline=None):
+        calls.append((list(sources), list(destinations)))
+        coords = np.asarray(coords)
+        return np.array([[abs(coords[s] - coords[d]).sum() * 1e5 for d in destinations] for s in sources])
+    return fetch
+
+
+def test_lookup_does_not_assign_slots(tmp_path):
+    store = TravelTimeStore('foot-walking', str(tmp_path), capacity=4)
+    durations = store.lookup(['a', 'b'])
+    assert np.isnan(durations[0, 1]) and durations[0, 0] == 0
+    assert store.index == {}
+
+
+def test_cached_matrix_stores_only_place_pairs(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(optimal_route, 'fetch_duration_matrix', fake_matrix(calls))
+    store = TravelTimeStore('foot-walking', str(tmp_path), capacity=4)
+
+    first = cached_duration_matrix(make_locations((12.4, 41.8), [1, 2, 3]), 'foot-walking', 'key', store)
+    assert len(calls) == 1
+    with open(tmp_path / 'foot-walking.index.json') as f:
+        assert sorted(json.load(f)) == ['1', '2', '3']
+
+    # A new start point and one new place: the start row/column and place 4 are
+    # fetched, known place pairs come from the store
+    calls.clear()
+    locations = make_locations((12.45, 41.85), [1, 2, 3, 4])
+    second = cached_duration_matrix(locations, 'foot-walking', 'key', store)
+    assert calls[0] == ([0, 4], [0, 1, 2, 3, 4])
+    assert calls[1] == ([1, 2, 3], [0, 4])
+    assert sorted(store.index) == ['1', '2', '3', '4']
+    assert np.array_equal(second[1:4, 1:4], first[1:, 1:])
+
+    expected = fake_matrix([])(locations.coords.tolist(), None, None, range(5), range(5))
+    assert np.array_equal(second, np.rint(expected).astype(np.int64))
+
+
+def test_update_assigns_slots_only_to_written_ids(tmp_path):
+    store = TravelTimeStore('foot-walking', str(tmp_path), capacity=4)
+    store.update(['a', 'b', 'c', 'd', 'e'], [0], [1, 2], [[10.0, 20.0]])
+    assert sorted(store.index) == ['a', 'b', 'c']
+    assert len(store.matrix) == 4
+
+    durations = store.lookup(['a', 'c', 'e'])
+    assert durations[0, 1] == 20.0
+    assert np.isnan(durations[0, 2])
+
+
+def test_writes_survive_reload_after_flush(tmp_path):
+    store = TravelTimeStore('foot-walking', str(tmp_path), capacity=4, flush_interval=3600)
+    store.update(['a', 'b'], [0], [1], [[42.0]])
+    store.flush()
+
+    reloaded = TravelTimeStore('foot-walking', str(tmp_path))
+    assert reloaded.lookup(['a', 'b'])[0, 1] == 42.0
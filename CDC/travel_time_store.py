@@ -0,0 +1,127 @@
+import atexit
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'travel_times')
+
+
+class TravelTimeStore:
+    """Persistent pairwise travel times (seconds) for one ORS profile.
+
+    Durations live in a memory-mapped float32 matrix on disk, indexed by a slot
+    per place id (kept in a JSON index next to it). Unknown pairs are NaN.
+    The matrix doubles in size when it runs out of slots. Writes are synced
+    to disk at most every `flush_interval` seconds (and by `flush`). Safe to
+    share between threads, not between processes.
+    """
+
+    def __init__(self, profile, directory=STORE_DIR, capacity=1024, flush_interval=30.0):
+        self.profile = profile
+        self.directory = directory
+        self.matrix_path = os.path.join(directory, f'{profile}.durations.npy')
+        self.index_path = os.path.join(directory, f'{profile}.index.json')
+        self.lock = threading.Lock()
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+
+        if os.path.exists(self.matrix_path) and os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+            self.matrix = np.load(self.matrix_path, mmap_mode='r+')
+        else:
+            self.index = {}
+            self.matrix = self._new_matrix(self.matrix_path, capacity)
+
+    @staticmethod
+    def _new_matrix(path, capacity):
+        matrix = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(capacity, capacity))
+        matrix[:] = np.nan
+        return matrix
+
+    def _grow(self, needed):
+        capacity = len(self.matrix)
+        while capacity < needed:
+            capacity *= 2
+        tmp_path = self.matrix_path + '.tmp'
+        grown = self._new_matrix(tmp_path, capacity)
+        old = len(self.matrix)
+        grown[:old, :old] = self.matrix
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self.matrix_path)
+        self.matrix = np.load(self.matrix_path, mmap_mode='r+')
+
+    def _slots(self, ids):
+        """Slots for `ids`, assigning (and persisting) new ones for unseen ids."""
+        keys = [str(place_id) for place_id in ids]
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self.index]
+        if new_keys:
+            if len(self.index) + len(new_keys) > len(self.matrix):
+                self._grow(len(self.index) + len(new_keys))
+            for key in new_keys:
+                self.index[key] = len(self.index)
+            self._save_index()
+        return np.array([self.index[key] for key in keys], dtype=np.int64)
+
+    def _save_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def lookup(self, ids):
+        """Return the (n, n) duration matrix for `ids`, with NaN for unknown pairs.
+
+        Ids the store has never seen are not given slots; only `update` adds them.
+        """
+        keys = [str(place_id) for place_id in ids]
+        durations = np.full((len(keys), len(keys)), np.nan)
+        with self.lock:
+            known = np.array([i for i, key in enumerate(keys) if key in self.index], dtype=np.int64)
+            if len(known):
+                slots = np.array([self.index[keys[i]] for i in known], dtype=np.int64)
+                durations[np.ix_(known, known)] = self.matrix[np.ix_(slots, slots)]
+        np.fill_diagonal(durations, 0.0)
+        return durations
+
+    def update(self, ids, sources, destinations, durations):
+        """Store a sources x destinations block of durations (indices into `ids`).
+
+        Only the ids of the written rows and columns get slots.
+        """
+        with self.lock:
+            source_slots = self._slots([ids[i] for i in sources])
+            destination_slots = self._slots([ids[i] for i in destinations])
+            block = np.asarray(durations, dtype=np.float32)
+            self.matrix[np.ix_(source_slots, destination_slots)] = block
+            if time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        """Sync every pending write to disk."""
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        self.matrix.flush()
+        self.last_flush = time.monotonic()
+
+
+def missing_pairs(durations):
+    """Rows and columns that still contain unknown (NaN) durations."""
+    unknown = np.isnan(durations)
+    return np.flatnonzero(unknown.any(axis=1)).tolist(), np.flatnonzero(unknown.any(axis=0)).tolist()
+
+
+@lru_cache(maxsize=None)
+def load_travel_time_store(profile, directory=STORE_DIR):
+    """Shared TravelTimeStore for a profile (one per process), flushed at exit."""
+    store = TravelTimeStore(profile, directory)
+    atexit.register(store.flush)
+    return store
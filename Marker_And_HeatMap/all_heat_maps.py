@@ -9,7 +9,7 @@ import streamlit as st
 def fetch_data(city):
     endpoint = "http://tour-pedia.org/api/getPlaces"
     categories = ['accommodation', 'attraction', 'restaurant', 'poi']
-    all_data = pd.DataFrame()
+    frames = []
     
     for category in categories:
         params = {
@@ -26,10 +26,12 @@ def fetch_data(city):
             else:
                 print(f"No data found for {category} in {city}.")
                 
-            all_data = pd.concat([all_data, category_data], ignore_index=True)
+            frames.append(category_data)
         else:
             print(f"Error fetching {category} data for {city}: {response.status_code}")
     
+    # One concat at the end instead of re-copying the growing frame for every category
+    all_data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
     if all_data.empty:
         print(f"No data available for {city}.")
         